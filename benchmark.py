@@ -0,0 +1,600 @@
+import argparse
+import random
+import re
+import time
+
+# Create argument parser
+parser = argparse.ArgumentParser(description="Benchmark pipeline components.")
+
+# Define arguments
+parser.add_argument(
+    "-b",
+    "--bench",
+    type=str,
+    default='coref',
+    help="Currently Available Benchmarks: coref, clean, rebel-batch, parser-parity, backend-parity, profiles, startup, io-format, upload-memory, projection"
+    )
+
+parser.add_argument(
+    "-s",
+    "--size",
+    type=int,
+    default=20,
+    help="Number of synthetic documents to generate"
+    )
+
+parser.add_argument(
+    "--batch-sizes",
+    type=int,
+    nargs="+",
+    default=[1, 4, 8, 16],
+    help="Batch sizes to compare for batched generation"
+    )
+
+parser.add_argument(
+    "--backends",
+    type=str,
+    nargs="+",
+    default=['torch', 'torch-int8', 'onnx'],
+    help="mREBEL inference backends to compare against torch"
+    )
+
+parser.add_argument(
+    "-m",
+    "--method",
+    type=str,
+    default='relik',
+    help="Model to measure startup for: relik, mrebel"
+    )
+
+# Parse arguments
+args = parser.parse_args()
+
+NAMES = ["John Smith", "Mary Tan", "the Ministry of Finance", "Acme Corporation", "Singapore"]
+SENTENCES = [
+    "{0} met {1} in {2}. He said that they would sign the agreement soon.",
+    "{0} announced a new policy. It was welcomed by {1}, who praised her efforts.",
+    "After the meeting, {0} flew back to {2}. She told reporters that it went well.",
+]
+
+# Generate synthetic documents of roughly n_sentences sentences each
+def synthetic_texts(n_docs, n_sentences=200, seed=42):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_docs):
+        texts.append(" ".join(
+            rng.choice(SENTENCES).format(*rng.sample(NAMES, 3))
+            for _ in range(n_sentences)
+        ))
+    return texts
+
+# Reference implementation of coref resolution prior to the token-to-entity index
+def resolve_coref_doc_legacy(coref_doc):
+    resolved_text = ""
+
+    for token in coref_doc:
+        repres = coref_doc._.coref_chains.resolve(token)
+        if repres:
+            resolved_text += " " + " and ".join(
+                [
+                    t.text
+                    if t.ent_type_ == ""
+                    else [e.text for e in coref_doc.ents if t in e][0]
+                    for t in repres
+                ]
+            )
+        else:
+            resolved_text += " " + token.text
+
+    return resolved_text
+
+def bench_coref(n_docs):
+    import spacy, coreferee
+    from functions.utils import resolve_coref_doc
+
+    coref_nlp = spacy.load('en_core_web_sm')
+    coref_nlp.add_pipe('coreferee')
+    docs = list(coref_nlp.pipe(synthetic_texts(n_docs)))
+    n_tokens = sum(len(doc) for doc in docs)
+
+    start_time = time.time()
+    legacy = [resolve_coref_doc_legacy(doc) for doc in docs]
+    legacy_time = time.time() - start_time
+
+    start_time = time.time()
+    resolved = [resolve_coref_doc(doc) for doc in docs]
+    resolved_time = time.time() - start_time
+
+    assert legacy == resolved, "Resolved text differs from legacy implementation!"
+
+    print(f"{n_docs} documents, {n_tokens} tokens")
+    print(f"Legacy resolution: {legacy_time:.4f} seconds")
+    print(f"Indexed resolution: {resolved_time:.4f} seconds")
+    print(f"Speedup: {legacy_time / resolved_time:.1f}x, output identical")
+
+# Generate synthetic raw text covering newlines, uppercase words, repeated spaces and unicode
+def synthetic_raw_texts(n_texts, seed=42):
+    rng = random.Random(seed)
+    words = ["the", "USA", "said", "Ministry", "NATO", "Ünïcode", "\n", "  ", "A", "deal", "co-op", "ß", "I", "CEO's", "\t"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(0, 60))) for _ in range(n_texts)]
+
+# Generate synthetic relationship types
+def synthetic_relationship_types(n_types, seed=42):
+    rng = random.Random(seed)
+    words = ["member of", "located in", "CEO", "part-of", "héad of", "ß", "founded_by", "  ", "2nd", "(country)"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(n_types)]
+
+# Reference implementations of text normalization prior to the precompiled patterns
+def clean_text_legacy(text):
+    text = re.sub("\n", " ", text)
+    text = re.sub(r'\b[A-Z]+\b', '', text).strip()
+    text = re.sub(" +", " ", text)
+
+    return text
+
+def clean_relationship_type_legacy(rel_type):
+    rel_type = rel_type.upper()
+    rel_type = rel_type.replace(" ", "_")
+    rel_type = re.sub(r"[^A-Z0-9_]", "", rel_type)
+    return rel_type
+
+def bench_clean(n_rows):
+    import pandas as pd
+    from functions.utils import clean_text_series, clean_relationship_type_series
+
+    for name, data, legacy_fn, series_fn in [
+        ("clean_text", synthetic_raw_texts(n_rows), clean_text_legacy, clean_text_series),
+        ("clean_relationship_type", synthetic_relationship_types(n_rows), clean_relationship_type_legacy, clean_relationship_type_series),
+    ]:
+        series = pd.Series(data)
+
+        start_time = time.time()
+        expected = series.apply(legacy_fn)
+        legacy_time = time.time() - start_time
+
+        start_time = time.time()
+        result = series_fn(series)
+        series_time = time.time() - start_time
+
+        # Compare values only, the string dtype of Series.apply output depends on the pandas version
+        assert expected.astype(object).equals(result.astype(object)), f"{name}: series output differs from legacy output!"
+
+        print(f"{name}: {n_rows} rows, {series.nunique()} distinct, output identical")
+        print(f"  Legacy Series.apply: {n_rows / legacy_time:,.0f} rows/sec")
+        print(f"  Series function:     {n_rows / series_time:,.0f} rows/sec")
+
+def bench_rebel_batch(n_docs, batch_sizes):
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+    from functions.rebel_utils import rebel_extract_raw
+
+    tokenizer = AutoTokenizer.from_pretrained("Babelscape/mrebel-large", src_lang="en_XX", tgt_lang="tp_XX")
+    model = AutoModelForSeq2SeqLM.from_pretrained("Babelscape/mrebel-large")
+
+    # Short documents of varying length, similar to windowed input
+    rng = random.Random(42)
+    texts = [text for n_sentences in range(1, 6) for text in synthetic_texts(n_docs // 5 or 1, n_sentences, seed=n_sentences)]
+    rng.shuffle(texts)
+
+    results = {}
+    for batch_size in batch_sizes:
+        start_time = time.time()
+        raw = rebel_extract_raw(texts, tokenizer, model, batch_size=batch_size)
+        results[batch_size] = (len(texts) / (time.time() - start_time), len(raw["relationships"]))
+
+    print(f"{len(texts)} documents")
+    for batch_size, (docs_per_sec, n_triplets) in results.items():
+        print(f"  batch size {batch_size:>3}: {docs_per_sec:.2f} docs/sec, {n_triplets} triplets")
+
+# Reference implementation of mREBEL triplet parsing on decoded text, prior to parsing token ids
+def extract_triplets_typed_legacy(text):
+    triplets = []
+    relation = ''
+    text = text.strip()
+    current = 'x'
+    subject, relation, object_, object_type, subject_type = '','','','',''
+
+    for token in text.replace("<s>", "").replace("<pad>", "").replace("</s>", "").replace("tp_XX", "").replace("__en__", "").split():
+        if token == "<triplet>" or token == "<relation>":
+            current = 't'
+            if relation != '':
+                triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
+                relation = ''
+            subject = ''
+        elif token.startswith("<") and token.endswith(">"):
+            if current == 't' or current == 'o':
+                current = 's'
+                if relation != '':
+                    triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
+                object_ = ''
+                subject_type = token[1:-1]
+            else:
+                current = 'o'
+                object_type = token[1:-1]
+                relation = ''
+        else:
+            if current == 't':
+                subject += ' ' + token
+            elif current == 's':
+                object_ += ' ' + token
+            elif current == 'o':
+                relation += ' ' + token
+    if subject != '' and relation != '' and object_ != '' and object_type != '' and subject_type != '':
+        triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
+    return triplets
+
+# Parse every generated sequence with the legacy parser on decoded text and with the token id parser
+# Both see the same sequences before any deduplication, so their triplet lists must be identical
+def bench_parser_parity(n_docs, batch_size=8):
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+    from functions.rebel_utils import GEN_KWARGS, rebel_special_ids, extract_triplets_from_ids
+
+    model_name = "Babelscape/mrebel-large"
+    tokenizer = AutoTokenizer.from_pretrained(model_name, src_lang="en_XX", tgt_lang="tp_XX")
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    special_ids = rebel_special_ids(tokenizer)
+
+    texts = synthetic_texts(n_docs, n_sentences=3)
+    sequences = []
+    for batch_start in range(0, len(texts), batch_size):
+        model_inputs = tokenizer(texts[batch_start:batch_start + batch_size],
+                                 max_length=256,
+                                 padding=True,
+                                 truncation=True,
+                                 return_tensors='pt')
+        generated_tokens = model.generate(model_inputs["input_ids"],
+                                          attention_mask=model_inputs["attention_mask"],
+                                          decoder_start_token_id=tokenizer.convert_tokens_to_ids("tp_XX"),
+                                          **GEN_KWARGS)
+        sequences.extend(generated_tokens.tolist())
+
+    start_time = time.time()
+    legacy = [extract_triplets_typed_legacy(text) for text in tokenizer.batch_decode(sequences, skip_special_tokens=False)]
+    legacy_time = time.time() - start_time
+
+    start_time = time.time()
+    from_ids = [extract_triplets_from_ids(token_ids, tokenizer, special_ids) for token_ids in sequences]
+    from_ids_time = time.time() - start_time
+
+    mismatches = [i for i, (old, new) in enumerate(zip(legacy, from_ids)) if old != new]
+    assert not mismatches, f"{len(mismatches)} of {len(sequences)} sequences parse differently, first: {legacy[mismatches[0]]} vs {from_ids[mismatches[0]]}"
+
+    print(f"{len(texts)} documents, {len(sequences)} sequences, {sum(map(len, legacy))} triplets, output identical")
+    print(f"  Decode + text parser: {len(sequences) / legacy_time:,.0f} sequences/sec")
+    print(f"  Token id parser:      {len(sequences) / from_ids_time:,.0f} sequences/sec")
+
+# Set of unique triplets over all documents
+def triplet_set(triplets_per_text):
+    return {(t['head'], t['head_type'], t['type'], t['tail'], t['tail_type'])
+            for triplets in triplets_per_text for t in triplets}
+
+def bench_backend_parity(n_docs, backends, batch_size=8):
+    from transformers import AutoTokenizer
+    import os
+    from functions.rebel_utils import load_rebel_model, onnx_export_dir, rebel_extract_docs
+
+    model_name = "Babelscape/mrebel-large"
+    onnx_dir = onnx_export_dir(os.getenv("HF_HOME", os.path.expanduser("~/.cache/huggingface")), model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, src_lang="en_XX", tgt_lang="tp_XX")
+
+    # Fixed sample so every backend sees the same input
+    texts = synthetic_texts(n_docs, n_sentences=3)
+
+    results = {}
+    for backend in ['torch'] + [b for b in backends if b != 'torch']:
+        model = load_rebel_model(model_name, backend, onnx_dir)
+        start_time = time.time()
+        triplets = triplet_set(rebel_extract_docs(texts, tokenizer, model, batch_size))
+        results[backend] = (len(texts) / (time.time() - start_time), triplets)
+
+    reference = results['torch'][1]
+    print(f"{len(texts)} documents, {len(reference)} unique triplets with torch")
+    for backend, (docs_per_sec, triplets) in results.items():
+        overlap = len(reference & triplets)
+        precision = overlap / len(triplets) if triplets else 0
+        recall = overlap / len(reference) if reference else 0
+        print(f"  {backend:<10}: {docs_per_sec:.2f} docs/sec, {len(triplets)} triplets, "
+              f"precision {precision:.3f}, recall {recall:.3f} against torch")
+
+def bench_profiles(n_docs, batch_size=8):
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+    from functions.rebel_utils import DECODING_PROFILES, rebel_extract_docs
+
+    model_name = "Babelscape/mrebel-large"
+    tokenizer = AutoTokenizer.from_pretrained(model_name, src_lang="en_XX", tgt_lang="tp_XX")
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+    texts = synthetic_texts(n_docs, n_sentences=3)
+
+    results = {}
+    for profile, gen_kwargs in DECODING_PROFILES.items():
+        start_time = time.time()
+        triplets = triplet_set(rebel_extract_docs(texts, tokenizer, model, batch_size, gen_kwargs))
+        results[profile] = (len(texts) / (time.time() - start_time), triplets)
+
+    reference = results['exhaustive'][1]
+    print(f"{len(texts)} documents, {len(reference)} unique triplets with exhaustive")
+    for profile, (docs_per_sec, triplets) in results.items():
+        recall = len(reference & triplets) / len(reference) if reference else 0
+        print(f"  {profile:<10}: {docs_per_sec:.2f} docs/sec, {len(triplets)} unique triplets, recall {recall:.3f} against exhaustive")
+
+# Time to import the model stack, load the weights and run the first inference
+# Run in a fresh process with HF_HOME pointing to the model cache to measure a cold start
+def bench_startup(method):
+    start_time = time.time()
+
+    if method == 'relik':
+        from relik import Relik
+        from functions.relik_utils import relik_iter_docs
+        import_time = time.time()
+
+        model = Relik.from_pretrained("relik-ie/relik-relation-extraction-large")
+        load_time = time.time()
+
+        list(relik_iter_docs(["John Smith lives in Paris."], model))
+
+    elif method == 'mrebel':
+        from transformers import AutoTokenizer
+        from functions.rebel_utils import load_rebel_model, rebel_extract_docs
+        import_time = time.time()
+
+        tokenizer = AutoTokenizer.from_pretrained("Babelscape/mrebel-large", src_lang="en_XX", tgt_lang="tp_XX")
+        model = load_rebel_model("Babelscape/mrebel-large")
+        load_time = time.time()
+
+        rebel_extract_docs(["John Smith lives in Paris."], tokenizer, model)
+
+    else:
+        raise Exception("No such model!")
+
+    end_time = time.time()
+    print(f"Imports: {import_time - start_time:.2f} seconds")
+    print(f"Model load: {load_time - import_time:.2f} seconds")
+    print(f"First inference: {end_time - load_time:.2f} seconds")
+    print(f"Time to first inference: {end_time - start_time:.2f} seconds")
+
+# Synthetic stage hand-off frames shaped like merged_df and relationships_df
+def synthetic_stage_frames(n_rows, seed=42):
+    import pandas as pd
+
+    rng = random.Random(seed)
+    texts = synthetic_texts(max(1, n_rows // 10), n_sentences=5, seed=seed)
+    merged_df = pd.DataFrame({
+        "index": range(n_rows),
+        "source": [f"https://example.com/news/{rng.randint(0, n_rows // 2)}" for _ in range(n_rows)],
+        "text": [rng.choice(texts) for _ in range(n_rows)],
+    })
+    merged_df['source_id'] = pd.factorize(merged_df['source'])[0]
+    merged_df['text_id'] = pd.factorize(merged_df['text'])[0]
+    merged_df['coref_text'] = merged_df['text']
+
+    relationship_types = synthetic_relationship_types(50, seed=seed)
+    relationships_df = pd.DataFrame({
+        "subject": [rng.choice(NAMES).lower() for _ in range(n_rows)],
+        "relationship": [rng.choice(relationship_types).upper() for _ in range(n_rows)],
+        "object": [rng.choice(NAMES).lower() for _ in range(n_rows)],
+        "confidence": [rng.random() for _ in range(n_rows)],
+        "text_id": [rng.randint(0, n_rows) for _ in range(n_rows)],
+        "source_id": [rng.randint(0, n_rows) for _ in range(n_rows)],
+        "object_entity_type": [rng.choice(["PERSON", "ORG", "GPE", "UNDEFINED"]) for _ in range(n_rows)],
+        "subject_entity_type": [rng.choice(["PERSON", "ORG", "GPE", "UNDEFINED"]) for _ in range(n_rows)],
+    })
+    return {"merged": merged_df, "relationships": relationships_df}
+
+def bench_io_format(n_rows):
+    from io import BytesIO, StringIO
+    import pandas as pd
+    from functions.aws_utils import cast_to_schema, to_arrow_schema
+    from functions.utils import STAGE_SCHEMAS
+
+    for name, df in synthetic_stage_frames(n_rows).items():
+        schema = STAGE_SCHEMAS[name]
+
+        start_time = time.time()
+        csv_buffer = StringIO()
+        df.to_csv(csv_buffer, index=False)
+        csv_bytes = csv_buffer.getvalue().encode("utf-8")
+        csv_save = time.time() - start_time
+
+        start_time = time.time()
+        pd.read_csv(BytesIO(csv_bytes))
+        csv_load = time.time() - start_time
+
+        start_time = time.time()
+        parquet_buffer = BytesIO()
+        typed_df = cast_to_schema(df, schema)
+        typed_df.to_parquet(parquet_buffer, engine='pyarrow', compression='zstd', index=False,
+                            schema=to_arrow_schema(typed_df, schema))
+        parquet_bytes = parquet_buffer.getvalue()
+        parquet_save = time.time() - start_time
+
+        start_time = time.time()
+        pd.read_parquet(BytesIO(parquet_bytes), engine='pyarrow')
+        parquet_load = time.time() - start_time
+
+        print(f"{name}_df: {n_rows} rows")
+        print(f"  CSV:     {len(csv_bytes) / 1e6:8.2f} MB, save {csv_save:.3f} s, load {csv_load:.3f} s")
+        print(f"  Parquet: {len(parquet_bytes) / 1e6:8.2f} MB, save {parquet_save:.3f} s, load {parquet_load:.3f} s")
+
+# S3 client that reads and discards uploads the way boto3 does, so no network is needed
+class DiscardingS3Client:
+    def put_object(self, Bucket, Key, Body):
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, Config=None):
+        while Fileobj.read(Config.multipart_chunksize):
+            pass
+
+# Resident memory in bytes from /proc/self/status (Linux), None where not available
+# Writing 5 to /proc/self/clear_refs resets the peak (VmHWM) to the current resident size
+def resident_memory(field):
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+def reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+# tracemalloc only sees Python allocations, Arrow buffers are only visible in the resident memory peak
+def bench_upload_memory(n_rows):
+    import gc
+    import tracemalloc
+    from io import BytesIO, StringIO
+    from functions.aws_utils import S3, cast_to_schema, to_arrow_schema
+    from functions.utils import STAGE_SCHEMAS
+
+    s3 = S3.__new__(S3)
+    s3.s3 = DiscardingS3Client()
+    df = synthetic_stage_frames(n_rows)["merged"]
+
+    # Previous approach: whole file in an in-memory buffer, copied by getvalue, sent in a single PUT
+    def upload_in_memory_csv():
+        csv_buffer = StringIO()
+        df.to_csv(csv_buffer, index=False)
+        s3.s3.put_object(Bucket='bench', Key='bench/merged_df.csv', Body=csv_buffer.getvalue())
+
+    def upload_in_memory_parquet():
+        parquet_buffer = BytesIO()
+        typed_df = cast_to_schema(df, STAGE_SCHEMAS['merged'])
+        typed_df.to_parquet(parquet_buffer, engine='pyarrow', compression='zstd', index=False,
+                            schema=to_arrow_schema(typed_df, STAGE_SCHEMAS['merged']))
+        s3.s3.put_object(Bucket='bench', Key='bench/merged_df.parquet', Body=parquet_buffer.getvalue())
+
+    def upload_streaming_csv():
+        s3.upload_to_s3('bench', 'bench', 'merged_df.csv', df, spool_size=8 * 1024 * 1024)
+
+    def upload_streaming_parquet():
+        s3.upload_to_s3('bench', 'bench', 'merged_df.parquet', df, schema=STAGE_SCHEMAS['merged'],
+                        spool_size=8 * 1024 * 1024)
+
+    # Streaming runs first, so their resident peak cannot hide in memory freed by the in-memory runs
+    for name, upload in [("streaming CSV", upload_streaming_csv),
+                         ("streaming Parquet", upload_streaming_parquet),
+                         ("in-memory CSV", upload_in_memory_csv),
+                         ("in-memory Parquet", upload_in_memory_parquet)]:
+        gc.collect()
+        rss_tracked = reset_peak_memory()
+        rss_start = resident_memory('VmRSS')
+
+        tracemalloc.start()
+        start_time = time.time()
+        upload()
+        elapsed = time.time() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rss_peak = f", RSS peak +{(resident_memory('VmHWM') - rss_start) / 1e6:8.2f} MB" if rss_tracked else ""
+        print(f"{name:18s}: {n_rows} rows, Python peak {peak / 1e6:8.2f} MB{rss_peak} above the DataFrame, {elapsed:.3f} s")
+
+# Object body that counts the bytes read from it
+# Like an S3 streaming body it has no file descriptor, so readers cannot bypass the count
+class CountingBody:
+    def __init__(self, body, counter):
+        self.body = body
+        self.counter = counter
+
+    def read(self, *args):
+        data = self.body.read(*args)
+        self.counter.bytes_read += len(data)
+        return data
+
+    def read1(self, *args):
+        data = self.body.read1(*args)
+        self.counter.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        n = self.body.readinto(buffer)
+        self.counter.bytes_read += n or 0
+        return n
+
+    def __iter__(self):
+        return iter(lambda: self.read(64 * 1024), b"")
+
+    def fileno(self):
+        raise OSError("No file descriptor")
+
+    def __getattr__(self, name):
+        return getattr(self.body, name)
+
+# Storage client counting the bytes of every object body read through it
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.bytes_read = 0
+
+    def get_object(self, **kwargs):
+        response = self.client.get_object(**kwargs)
+        response['Body'] = CountingBody(response['Body'], self)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+# Full reads against reads of only the columns model.py needs, on local storage so only parsing and I/O are measured
+def bench_projection(n_rows):
+    import tempfile
+    from functions.aws_utils import S3
+    from functions.utils import STAGE_SCHEMAS
+
+    columns = ['text_id', 'source_id', 'coref_text']
+    df = synthetic_stage_frames(n_rows)["merged"]
+
+    with tempfile.TemporaryDirectory() as local_root:
+        s3 = S3(None, None, storage_backend='local', local_root=local_root)
+        s3.upload_to_s3('bench', 'bench', 'merged_df.csv', df)
+        s3.upload_to_s3('bench', 'bench', 'merged_df.parquet', df, schema=STAGE_SCHEMAS['merged'])
+        s3.s3 = CountingClient(s3.s3)
+
+        for file_name in ['merged_df.csv', 'merged_df.parquet']:
+            size = s3.s3.head_object(Bucket='bench', Key=f'bench/{file_name}')['ContentLength']
+            for name, kwargs in [("all columns", {}), ("projected", {"columns": columns})]:
+                s3.s3.bytes_read = 0
+                start_time = time.time()
+                s3.read_from_s3('bench', f'bench/{file_name}', **kwargs)
+                elapsed = time.time() - start_time
+                print(f"{file_name:18s} {name:12s}: {elapsed:.3f} s, {s3.s3.bytes_read / 1e6:8.2f} of {size / 1e6:.2f} MB read")
+
+
+if __name__ == "__main__":
+
+    if args.bench == 'coref':
+        bench_coref(args.size)
+
+    elif args.bench == 'clean':
+        bench_clean(args.size)
+
+    elif args.bench == 'rebel-batch':
+        bench_rebel_batch(args.size, args.batch_sizes)
+
+    elif args.bench == 'parser-parity':
+        bench_parser_parity(args.size)
+
+    elif args.bench == 'backend-parity':
+        bench_backend_parity(args.size, args.backends)
+
+    elif args.bench == 'profiles':
+        bench_profiles(args.size)
+
+    elif args.bench == 'startup':
+        bench_startup(args.method)
+
+    elif args.bench == 'io-format':
+        bench_io_format(args.size)
+
+    elif args.bench == 'upload-memory':
+        bench_upload_memory(args.size)
+
+    elif args.bench == 'projection':
+        bench_projection(args.size)
+
+    else:
+        raise Exception("No such benchmark!")
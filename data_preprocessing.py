@@ -1,10 +1,100 @@
 import pandas as pd
 import spacy, coreferee
-from functions.utils import coref_text, clean_text
+import argparse
+from functions.utils import coref_texts, coref_texts_cached, clean_text_series, factorize_stable, hash_text, STAGE_SCHEMAS
 from functions.aws_utils import S3
+from functions.cache_utils import load_sqlite_cache, save_sqlite_cache
 import os
+import tempfile
 from dotenv import load_dotenv
 
+# Create argument parser
+parser = argparse.ArgumentParser(description="Preprocess raw data.")
+
+# Define arguments
+parser.add_argument(
+    "-b",
+    "--batch-size",
+    type=int,
+    default=64,
+    help="Number of texts per nlp.pipe batch for coreference resolution"
+    )
+
+parser.add_argument(
+    "-n",
+    "--n-process",
+    type=int,
+    default=1,
+    help="Number of processes used for coreference resolution"
+    )
+
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="Resolve every text instead of reusing the coref cache from previous runs"
+    )
+
+parser.add_argument(
+    "-c",
+    "--chunksize",
+    type=int,
+    default=None,
+    help="Stream raw data in chunks of this many rows to keep memory bounded"
+    )
+
+# Parse arguments
+args = parser.parse_args()
+
+# Raw data files and the columns to rename for consistency
+RAW_FILES = [
+    ('data/raw-data/news_excerpts_parsed.csv', {"Link":"source", "Text":"text"}),
+    ('data/raw-data/wikileaks_parsed.csv', {"PDF Path":"source", "Text":"text"}),
+]
+
+# Coref and clean a column of raw text, reusing cached results if a cache is given
+def preprocess_text(coref_nlp, texts, cache=None):
+    if cache is None:
+        resolved = coref_texts(coref_nlp,
+                               texts,
+                               batch_size=args.batch_size,
+                               n_process=args.n_process)
+    else:
+        resolved = coref_texts_cached(coref_nlp,
+                                      texts.tolist(),
+                                      cache,
+                                      batch_size=args.batch_size,
+                                      n_process=args.n_process)
+
+    return clean_text_series(pd.Series(resolved, index=texts.index))
+
+# Coref and clean each unique text once, then broadcast results back to every row with that text_id
+def preprocess_unique(coref_nlp, df, cache=None):
+    unique_df = df.drop_duplicates(subset=['text_id'])
+    print(f"Preprocessing {len(unique_df)} unique texts for {len(df)} rows, {len(df) - len(unique_df)} duplicates skipped.")
+
+    resolved = preprocess_text(coref_nlp, unique_df['text'], cache)
+    return df['text_id'].map(dict(zip(unique_df['text_id'], resolved)))
+
+# Read and preprocess raw data chunk by chunk, keeping ids consistent across chunks
+def stream_preprocess(s3, coref_nlp, cache, chunksize):
+    source_ids, text_ids = {}, {}
+    columns = None
+
+    for file_path, rename_columns in RAW_FILES:
+        chunks = s3.read_from_s3('datathon2025', file_path, chunksize=chunksize)
+
+        for chunk in chunks:
+            chunk = chunk.rename(columns=rename_columns)
+            chunk['source_id'] = factorize_stable(chunk['source'], source_ids)
+            chunk['text_id'] = factorize_stable(chunk['text'], text_ids, key=hash_text)
+            chunk = chunk.reset_index()
+            chunk['coref_text'] = preprocess_unique(coref_nlp, chunk, cache)
+
+            # Keep the columns of the first chunk so every chunk matches the header
+            if columns is None:
+                columns = chunk.columns
+            yield chunk.reindex(columns=columns)
+
 # Usage
 if __name__ == "__main__":
 
@@ -13,36 +103,55 @@ if __name__ == "__main__":
         AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 
         # Create S3 instance
-        s3 = S3(aws_access_key_id=AWS_ACCESS_KEY_ID, 
+        s3 = S3(aws_access_key_id=AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=AWS_SECRET_KEY)
 
-        # Read data from S3
-        news_df = s3.read_from_s3('datathon2025',
-                                'data/raw-data/news_excerpts_parsed.csv')
+        coref_nlp = spacy.load('en_core_web_sm')
+        coref_nlp.add_pipe('coreferee')
+
+        # Load coref results of previous runs, keyed by hash of the raw text
+        # The cache lives in a local SQLite file, so its size does not count against memory
+        cache = None
+        cache_dir = tempfile.TemporaryDirectory()
+        if not args.no_cache:
+            cache = load_sqlite_cache(s3,
+                                      'datathon2025',
+                                      'data/preprocess/coref_cache.sqlite',
+                                      os.path.join(cache_dir.name, 'coref_cache.sqlite'))
 
-        wikileaks_df = s3.read_from_s3('datathon2025',
-                                        'data/raw-data/wikileaks_parsed.csv')
+        if args.chunksize:
+            # Process and upload chunk by chunk
+            s3.upload_chunks_to_s3('datathon2025',
+                                   'data/preprocess',
+                                   'merged_df.parquet',
+                                   stream_preprocess(s3, coref_nlp, cache, args.chunksize),
+                                   schema=STAGE_SCHEMAS['merged'])
 
-        # Rename columns to keep column name consistent
-        news_df = news_df.rename(columns={"Link":"source", "Text":"text"})
-        wikileaks_df = wikileaks_df.rename(columns={"PDF Path":"source", "Text":"text"})
+        else:
+            # Read data from S3, all files at once
+            raw_dfs = s3.read_many('datathon2025', [file_path for file_path, _ in RAW_FILES])
 
-        # Merge data from both source and give them ids
-        merged_df = pd.concat([news_df, wikileaks_df])
-        merged_df['source_id'] = pd.factorize(merged_df['source'])[0]
-        merged_df['text_id'] = pd.factorize(merged_df['text'])[0]
-        merged_df = merged_df.reset_index()
+            # Rename columns to keep column name consistent
+            raw_dfs = [raw_dfs[file_path].rename(columns=rename_columns) for file_path, rename_columns in RAW_FILES]
 
-        # Coref text
-        coref_nlp = spacy.load('en_core_web_sm')
-        coref_nlp.add_pipe('coreferee')
-        merged_df['coref_text'] = merged_df['text'].apply(lambda x: coref_text(coref_nlp, x))
+            # Merge data from both source and give them ids
+            merged_df = pd.concat(raw_dfs)
+            merged_df['source_id'] = pd.factorize(merged_df['source'])[0]
+            merged_df['text_id'] = pd.factorize(merged_df['text'])[0]
+            merged_df = merged_df.reset_index()
+
+            # Coref and clean text
+            merged_df['coref_text'] = preprocess_unique(coref_nlp, merged_df, cache)
 
-        # Clean text
-        merged_df['coref_text'] = merged_df['coref_text'].apply(clean_text)
+            # Upload output to S3
+            s3.upload_to_s3('datathon2025',
+                            'data/preprocess',
+                            'merged_df.parquet',
+                            merged_df,
+                            schema=STAGE_SCHEMAS['merged'])
 
-        # Upload output to S3
-        s3.upload_to_s3('datathon2025',
-                        'data/preprocess',
-                        'merged_df.csv',
-                        merged_df)
+        # Save updated cache for the next run
+        if cache is not None:
+            save_sqlite_cache(s3, 'datathon2025', 'data/preprocess', 'coref_cache.sqlite', cache)
+            cache.close()
+        cache_dir.cleanup()
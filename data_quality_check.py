@@ -2,6 +2,7 @@ import pandas as pd
 import re
 import argparse
 from functions.aws_utils import *
+from functions.utils import STAGE_SCHEMAS
 
 from dotenv import load_dotenv
 import os
@@ -117,11 +118,10 @@ if __name__ == "__main__":
             aws_secret_access_key=AWS_SECRET_KEY)
     
         # Retrieve dfs
-    entities_df = s3.read_from_s3('datathon2025',
-                              f'data/model-output/entities_df_{method}.csv')
-
-    relationships_df = s3.read_from_s3('datathon2025',
-                              f'data/model-output/relationships_df_{method}.csv')
+    entities_path = f'data/model-output/entities_df_{method}.parquet'
+    relationships_path = f'data/model-output/relationships_df_{method}.parquet'
+    dfs = s3.read_many('datathon2025', [entities_path, relationships_path])
+    entities_df, relationships_df = dfs[entities_path], dfs[relationships_path]
 
     # Create pipeline and apply transformations
     pipeline = TripletValidationPipeline(relationships_df)
@@ -136,10 +136,12 @@ if __name__ == "__main__":
             # Upload output to S3
     s3.upload_to_s3('datathon2025',
                     'data/validation',
-                    'clean_relationships_df.csv',
-                    cleaned_df)
+                    'clean_relationships_df.parquet',
+                    cleaned_df,
+                    schema=STAGE_SCHEMAS['relationships'])
     
     s3.upload_to_s3('datathon2025',
                     'data/validation',
-                    'clean_entities_df.csv',
-                    entities_df)
\ No newline at end of file
+                    'clean_entities_df.parquet',
+                    entities_df,
+                    schema=STAGE_SCHEMAS['entities'])
\ No newline at end of file
@@ -1,47 +1,283 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
 import botocore
+from botocore.config import Config
 from dotenv import load_dotenv
 import subprocess
 import os
-from io import StringIO
+from io import BytesIO, RawIOBase
+import operator
+import numbers
 import pandas as pd
+import numpy as np
 import re
-import datetime
-from pytz import timezone
+import tempfile
+import threading
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functions.local_storage_utils import LocalS3Client
+
+
+# File format of a DataFrame object, given explicitly or taken from the file extension
+def get_file_format(file_name, file_format=None):
+    if file_format:
+        return file_format
+    return 'parquet' if file_name.endswith('.parquet') else 'csv'
+
+# Cast columns to the types of an explicit schema (column -> arrow type name)
+# Values that do not fit numeric types, e.g. 'UNDEFINED' confidence, become null
+def cast_to_schema(df, schema=None):
+    if not schema:
+        return df
+
+    df = df.copy()
+    for col, col_type in schema.items():
+        if col not in df.columns:
+            continue
+        if col_type.startswith('int'):
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        elif col_type.startswith(('float', 'double')):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        elif col_type == 'string':
+            df[col] = df[col].astype(str).where(df[col].notna(), None)
+
+    return df
+
+# Arrow schema of a DataFrame, using the explicit types where given and inferred types otherwise
+def to_arrow_schema(df, schema=None):
+    import pyarrow as pa
+
+    # Columns that are entirely null cannot be typed from the data, they are kept as strings
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    inferred = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                          for field in inferred])
+    if not schema:
+        return inferred
+
+    return pa.schema([
+        pa.field(name, pa.type_for_alias(schema[name])) if name in schema else inferred.field(name)
+        for name in df.columns
+    ])
+
+# Write DataFrame chunks to a Parquet file, one row group per chunk, with the schema of the first chunk
+def write_parquet_chunks(parquet_file, chunks, schema=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            chunk = cast_to_schema(chunk, schema)
+            if writer is None:
+                arrow_schema = to_arrow_schema(chunk, schema)
+                writer = pq.ParquetWriter(parquet_file, arrow_schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=arrow_schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+# Row filters are lists of (column, op, value) tuples, all of which must hold, as in pyarrow
+FILTER_OPS = {
+    '==': operator.eq, '=': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+# Keep the rows of df that satisfy every filter
+def apply_filters(df, filters=None):
+    if not filters:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if op in ('in', 'not in'):
+            col_mask = df[col].isin(list(value))
+            mask &= col_mask if op == 'in' else ~col_mask
+        else:
+            mask &= FILTER_OPS[op](df[col], value)
+    return df[mask]
+
+# S3 Select SQL for a column projection and row filters on a CSV with a header row
+# Numbers, including numpy scalars, are compared as numbers, everything else as strings
+def select_expression(columns, filters=None):
+    def is_number(value):
+        return isinstance(value, numbers.Number) and not isinstance(value, (bool, np.bool_))
+
+    def quote_value(value):
+        if is_number(value):
+            return str(int(value)) if isinstance(value, numbers.Integral) else repr(float(value))
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def quote_column(col, value):
+        if isinstance(value, (list, tuple, set)):
+            value = next(iter(value), '')
+        if is_number(value):
+            return f'CAST(s."{col}" AS FLOAT)'
+        return f's."{col}"'
+
+    conditions = []
+    for col, op, value in filters or []:
+        if op in ('in', 'not in'):
+            values = ", ".join(quote_value(v) for v in value)
+            conditions.append(f"{quote_column(col, value)} {op.upper()} ({values})")
+        else:
+            conditions.append(f"{quote_column(col, value)} {'=' if op == '==' else op} {quote_value(value)}")
+
+    expression = "SELECT " + ", ".join(f's."{col}"' for col in columns) + " FROM S3Object s"
+    if conditions:
+        expression += " WHERE " + " AND ".join(conditions)
+    return expression
+
+# Seekable read-only file over an S3 object, fetching only the byte ranges that are read
+# Lets pyarrow read just the footer and the column chunks / row groups it needs
+class S3RangeReader(RawIOBase):
+    def __init__(self, s3_client, bucket_name, file_path):
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.file_path = file_path
+        self.size = s3_client.head_object(Bucket=bucket_name, Key=file_path)['ContentLength']
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self.position = offset
+        elif whence == 1:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+
+        response = self.s3.get_object(Bucket=self.bucket_name,
+                                      Key=self.file_path,
+                                      Range=f"bytes={self.position}-{end - 1}")
+        data = response['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+# Split a DataFrame into consecutive row chunks of about chunk_bytes each, at least one chunk even if empty
+# Rows per chunk follow the measured size of the previous chunk, so long raw texts give short chunks
+def iter_row_chunks(df, chunk_bytes=8 * 1024 * 1024):
+    rows_per_chunk = 100
+    start = 0
+    while True:
+        chunk = df.iloc[start:start + rows_per_chunk]
+        yield chunk
+
+        start += len(chunk)
+        if start >= len(df):
+            break
+
+        chunk_size = max(int(chunk.memory_usage(index=False, deep=True).sum()), 1)
+        rows_per_chunk = max(1, int(len(chunk) * chunk_bytes / chunk_size))
+
+# Write a DataFrame to a binary file as CSV, chunk_bytes at a time
+# Only one chunk is held in memory as text and as encoded bytes on top of the DataFrame itself
+def write_csv_chunks(csv_file, df, chunk_bytes=8 * 1024 * 1024):
+    for idx, chunk in enumerate(iter_row_chunks(df, chunk_bytes)):
+        csv_file.write(chunk.to_csv(index=False, header=(idx == 0)).encode("utf-8"))
+
+# Managed transfer settings for multipart uploads
+# Files larger than part_size are uploaded in parts of part_size bytes, max_concurrency parts at a time
+def transfer_config(part_size=8 * 1024 * 1024, max_concurrency=10):
+    return TransferConfig(multipart_threshold=part_size,
+                          multipart_chunksize=part_size,
+                          max_concurrency=max_concurrency)
+
+
+# botocore settings shared by every client, each can be overridden with an environment variable
+def client_config(**overrides):
+    settings = {
+        "max_pool_connections": int(os.getenv("AWS_MAX_POOL_CONNECTIONS", 50)),
+        "retries": {"mode": os.getenv("AWS_RETRY_MODE", "adaptive"),
+                    "max_attempts": int(os.getenv("AWS_MAX_ATTEMPTS", 10))},
+        "connect_timeout": int(os.getenv("AWS_CONNECT_TIMEOUT", 10)),
+        "read_timeout": int(os.getenv("AWS_READ_TIMEOUT", 60)),
+    }
+    settings.update(overrides)
+    return Config(**settings)
+
+# Process-wide sessions and clients, so credentials are resolved and connection pools are set up only once
+# boto3 sessions are not thread-safe to create from, hence the lock; the clients themselves are
+_SESSIONS = {}
+_CLIENTS = {}
+_CLIENT_LOCK = threading.Lock()
+
+def get_session(aws_access_key_id, aws_secret_key, region_name='ap-southeast-1'):
+    key = (aws_access_key_id, aws_secret_key, region_name)
+    with _CLIENT_LOCK:
+        if key not in _SESSIONS:
+            _SESSIONS[key] = boto3.Session(aws_access_key_id=aws_access_key_id,
+                                           aws_secret_access_key=aws_secret_key,
+                                           region_name=region_name)
+        return _SESSIONS[key]
+
+# Clients with an explicit config are cached separately from those with the shared default config
+def get_cached_client(session, client_name, config=None):
+    key = (id(session), client_name, None if config is None else id(config))
+    with _CLIENT_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = session.client(client_name, config=config or client_config())
+            print(f"{client_name.upper()} client created.")
+        return _CLIENTS[key]
 
 
 # Connection class
+# Instances with the same credentials and region share one session and one client per service
 class AWSConnection:
-    def __init__(self, aws_access_key_id, aws_secret_key, region_name='ap-southeast-1'):
+    def __init__(self, aws_access_key_id, aws_secret_key, region_name='ap-southeast-1', config=None):
 
         try:
-            self.session = boto3.Session(
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_key,
-            region_name=region_name
-            )
+            self.session = get_session(aws_access_key_id, aws_secret_key, region_name)
             print("Connection to AWS Established!")
         except (NoCredentialsError, PartialCredentialsError) as e:
             print(f"Error: {e}")
             self.session = None
 
         self.region_name = region_name
+        self.config = config
 
     # Retrieve client for particular service E.g. S3, ECS, EC2
     def get_client(self, client_name):
         if self.session:
             print(f"{client_name.upper()} session successfully initialized.")
-            return self.session.client(client_name)
+            return get_cached_client(self.session, client_name, self.config)
         else:
             raise Exception("AWS session not initialized properly.")
 
 
 # S3 Service Class
+# With STORAGE_BACKEND=local (or storage_backend='local'), objects are read from and written to
+# LOCAL_STORAGE_ROOT (default ./storage) on local disk instead, with no AWS connection at all
 class S3:
-    def __init__(self, aws_access_key_id, aws_secret_access_key):
-        aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key)
-        self.s3 = aws_connection.get_client("s3")  
+    def __init__(self, aws_access_key_id, aws_secret_access_key, config=None, storage_backend=None, local_root=None):
+        storage_backend = storage_backend or os.getenv("STORAGE_BACKEND", "s3")
+
+        if storage_backend == 'local':
+            local_root = local_root or os.getenv("LOCAL_STORAGE_ROOT", "storage")
+            self.s3 = LocalS3Client(local_root)
+            print(f"Using local storage at '{self.s3.root}'.")
+        elif storage_backend == 's3':
+            aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key, config=config)
+            self.s3 = aws_connection.get_client("s3")
+        else:
+            raise Exception(f"Unknown storage backend '{storage_backend}'.")
     
     # List all buckets
     def list_buckets(self):
@@ -66,39 +302,123 @@ class S3:
 
 
     # Upload files to S3
-    def upload_to_s3(self, bucket_name, prefix, file_name, file, df=True):
+    # DataFrames are written as CSV, or as Parquet (zstd) if file_format or the file extension says so
+    # DataFrames and file objects are streamed through a spooled temporary file with a managed multipart upload,
+    # so files larger than spool_size never sit in memory and are not limited to the 5 GB of a single PUT
+    # Both formats are written in chunks of about chunk_bytes, Parquet as one row group per chunk
+    def upload_to_s3(self, bucket_name, prefix, file_name, file, df=True, file_format=None, schema=None,
+                     part_size=8 * 1024 * 1024, max_concurrency=10, spool_size=64 * 1024 * 1024,
+                     chunk_bytes=8 * 1024 * 1024):
 
         # file_path e.g. clean_data/
+        s3_file_path = f"{prefix}/{file_name}"
 
-        if df:
-            # Create an in-memory buffer
-            csv_buffer = StringIO()
+        try:
+            if df:
+                with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+                    if get_file_format(file_name, file_format) == 'parquet':
+                        write_parquet_chunks(spool, iter_row_chunks(file, chunk_bytes), schema)
+                    else:
+                        write_csv_chunks(spool, file, chunk_bytes)
 
-            # Write the df to the buffer
-            file.to_csv(csv_buffer, index=False)
-            file = csv_buffer.getvalue()
+                    spool.seek(0)
+                    self.s3.upload_fileobj(spool, bucket_name, s3_file_path,
+                                           Config=transfer_config(part_size, max_concurrency))
 
-        s3_file_path = f"{prefix}/{file_name}"
+            elif hasattr(file, 'read'):
+                self.s3.upload_fileobj(file, bucket_name, s3_file_path,
+                                       Config=transfer_config(part_size, max_concurrency))
+
+            else:
+                # Small payloads such as configs and manifests go in a single request
+                self.s3.put_object(Bucket=bucket_name, Key=s3_file_path, Body=file)
 
-        try:
-            # Uploading file
-            self.s3.put_object(Bucket=bucket_name, Key=s3_file_path, Body=file)
             print(f"file '{file_name}' has been uploaded to S3 at '{s3_file_path}'")
+            return True
 
         except Exception as e:
             print(f"Error uploading file to S3: {e}")
+            return False
+
+
+
+    # Upload an iterable of DataFrames to S3 as a single CSV using a multipart upload
+    # Only one part (part_size bytes, at least 5 MB) is held in memory at a time
+    # Parquet files are written chunk by chunk as row groups to a temporary file and then uploaded
+    def upload_chunks_to_s3(self, bucket_name, prefix, file_name, chunks, part_size=8 * 1024 * 1024, file_format=None, schema=None):
 
+        s3_file_path = f"{prefix}/{file_name}"
+        upload_id = None
+
+        if get_file_format(file_name, file_format) == 'parquet':
+            try:
+                with tempfile.TemporaryFile() as parquet_file:
+                    write_parquet_chunks(parquet_file, chunks, schema)
+                    parquet_file.seek(0)
+                    self.s3.upload_fileobj(parquet_file, bucket_name, s3_file_path,
+                                           Config=transfer_config(part_size))
+                print(f"file '{file_name}' has been uploaded to S3 at '{s3_file_path}'")
+                return True
+
+            except Exception as e:
+                print(f"Error uploading file to S3: {e}")
+                return False
+
+        try:
+            upload_id = self.s3.create_multipart_upload(Bucket=bucket_name, Key=s3_file_path)['UploadId']
+            parts = []
+            buffer = BytesIO()
+
+            def upload_part():
+                response = self.s3.upload_part(Bucket=bucket_name,
+                                               Key=s3_file_path,
+                                               UploadId=upload_id,
+                                               PartNumber=len(parts) + 1,
+                                               Body=buffer.getvalue())
+                parts.append({"ETag": response['ETag'], "PartNumber": len(parts) + 1})
+                buffer.seek(0)
+                buffer.truncate()
+
+            for idx, chunk in enumerate(chunks):
+                buffer.write(chunk.to_csv(index=False, header=(idx == 0)).encode("utf-8"))
+                if buffer.tell() >= part_size:
+                    upload_part()
+
+            # Last part may be smaller than the minimum part size
+            if buffer.tell() > 0 or not parts:
+                upload_part()
+
+            self.s3.complete_multipart_upload(Bucket=bucket_name,
+                                              Key=s3_file_path,
+                                              UploadId=upload_id,
+                                              MultipartUpload={"Parts": parts})
+            print(f"file '{file_name}' has been uploaded to S3 at '{s3_file_path}' in {len(parts)} parts")
+            return True
+
+        except Exception as e:
+            print(f"Error uploading file to S3: {e}")
+            if upload_id:
+                self.s3.abort_multipart_upload(Bucket=bucket_name, Key=s3_file_path, UploadId=upload_id)
+            return False
 
 
     # Read file from S3
-    def read_from_s3(self, bucket_name, file_path, df=True):
+    # columns and filters ([(column, op, value), ...]) are pushed down as far as the format allows:
+    # Parquet only fetches the needed column chunks and skips row groups ruled out by their statistics,
+    # CSV is queried with S3 Select, falling back to reading only the needed columns with pandas
+    def read_from_s3(self, bucket_name, file_path, df=True, file_format=None, columns=None, filters=None, **kwargs):
+        if df and (columns or filters):
+            return self.read_projection(bucket_name, file_path, file_format, columns, filters, **kwargs)
+
         try:
             response = self.s3.get_object(Bucket=bucket_name, Key=file_path)
             # Read the CSV file directly from S3 into a DataFrame
 
             output = response['Body']
-            if df:
-                output = pd.read_csv(output)  # 'Body' contains the file content
+            if df and get_file_format(file_path, file_format) == 'parquet':
+                output = pd.read_parquet(BytesIO(output.read()), engine='pyarrow', **kwargs)
+            elif df:
+                output = pd.read_csv(output, **kwargs)  # 'Body' contains the file content
             
             print(f"file from {file_path} successfully loaded.")
             return output
@@ -108,27 +428,120 @@ class S3:
             return None
         
 
-    def check_file_update(self, bucket_name, file_path):
-        sg_timezone = timezone("Asia/Singapore")
+    def read_projection(self, bucket_name, file_path, file_format=None, columns=None, filters=None, **kwargs):
+        try:
+            if get_file_format(file_path, file_format) == 'parquet':
+                import pyarrow.parquet as pq
+
+                # Unbuffered, so every read is an exact ranged GET, pre_buffer coalesces nearby column chunks
+                reader = S3RangeReader(self.s3, bucket_name, file_path)
+                table = pq.read_table(reader,
+                                      columns=columns,
+                                      filters=filters or None,
+                                      pre_buffer=True)
+                output = table.to_pandas()
+                print(f"file from {file_path} successfully loaded, {reader.bytes_read} of {reader.size} bytes read.")
+                return output
+
+            if columns and 'chunksize' not in kwargs and hasattr(self.s3, 'select_object_content'):
+                try:
+                    output = self.select_csv(bucket_name, file_path, columns, filters, **kwargs)
+                    print(f"file from {file_path} successfully loaded with S3 Select.")
+                    return output
+                except Exception as e:
+                    print(f"S3 Select not available for {file_path}, reading with pandas: {e}")
+
+            # Filter columns must be parsed too, they are dropped again after filtering
+            filter_columns = [col for col, _, _ in filters or []]
+            usecols = None if not columns else list(dict.fromkeys(list(columns) + filter_columns))
+            output = self.read_from_s3(bucket_name, file_path, file_format='csv', usecols=usecols, **kwargs)
+            if output is None:
+                return None
 
-        response = self.s3.head_object(Bucket=bucket_name, Key=file_path)
-        last_modified = response['LastModified'].astimezone(sg_timezone)
+            if 'chunksize' in kwargs:
+                return (apply_filters(chunk, filters)[columns or chunk.columns] for chunk in output)
+            return apply_filters(output, filters)[columns or output.columns]
 
-        # Convert to UTC date for comparison
-        last_modified_date = last_modified.date()
-        today = datetime.datetime.now(sg_timezone).date()
+        except Exception as e:
+            print(f"Error reading file from S3: {e}")
+            return None
 
-        if last_modified_date == today:
-            print(f"✅ File '{bucket_name}' was updated today ({last_modified_date}).")
-            return True
-        else:
-            print(f"❌ File '{bucket_name}' was last modified on {last_modified_date}, no new updates.")
-            return False
+
+    # Run a column projection and row filters on a CSV object server-side with S3 Select
+    # The output has no header, so the requested columns are used as names
+    def select_csv(self, bucket_name, file_path, columns, filters=None, **kwargs):
+        response = self.s3.select_object_content(
+            Bucket=bucket_name,
+            Key=file_path,
+            ExpressionType='SQL',
+            Expression=select_expression(columns, filters),
+            InputSerialization={'CSV': {'FileHeaderInfo': 'USE', 'AllowQuotedRecordDelimiter': True},
+                                'CompressionType': 'NONE'},
+            OutputSerialization={'CSV': {}})
+
+        records = BytesIO()
+        for event in response['Payload']:
+            if 'Records' in event:
+                records.write(event['Records']['Payload'])
+        records.seek(0)
+
+        return pd.read_csv(records, header=None, names=list(columns), **kwargs)
+
+
+    # Read several files concurrently, returning {file_path: output} with None for files that failed
+    # kwargs are passed to read_from_s3 for every file, file_paths can also be a dict of per-file kwargs
+    # Wall-clock is bounded by the slowest file rather than the sum over all files
+    def read_many(self, bucket_name, file_paths, max_workers=8, **kwargs):
+        if not isinstance(file_paths, dict):
+            file_paths = {file_path: {} for file_path in file_paths}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(file_paths)))) as executor:
+            futures = {file_path: executor.submit(self.read_from_s3, bucket_name, file_path, **{**kwargs, **file_kwargs})
+                       for file_path, file_kwargs in file_paths.items()}
+            return {file_path: future.result() for file_path, future in futures.items()}
+
+
+    # ETag and size of every object under the watched prefixes, {key: {"etag": ..., "size": ...}}
+    # All prefixes are covered by a single paginated listing of their longest common prefix
+    def list_object_etags(self, bucket_name, prefixes):
+        common_prefix = os.path.commonprefix(list(prefixes))
+        common_prefix = common_prefix[:common_prefix.rfind('/') + 1]
+
+        objects = {}
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=common_prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].startswith(tuple(prefixes)) and not obj['Key'].endswith('/'):
+                    objects[obj['Key']] = {"etag": obj['ETag'], "size": obj['Size']}
+
+        return objects
+
+
+    # Compare the objects under the watched prefixes with the manifest of the last processed run
+    # Only real content changes count: a rewrite with identical content keeps its ETag and size
+    # Returns the changed (new or modified) and deleted keys, and the current objects to save as the next manifest
+    def detect_changes(self, bucket_name, prefixes, manifest_path):
+        current = self.list_object_etags(bucket_name, prefixes)
+
+        response = self.read_from_s3(bucket_name, manifest_path, df=False)
+        previous = {} if response is None else json.loads(response.read().decode('utf-8'))
+
+        changed = sorted(key for key, version in current.items() if previous.get(key) != version)
+        deleted = sorted(key for key in previous if key not in current)
+
+        print(f"{len(changed)} changed and {len(deleted)} deleted objects out of {len(current)} watched.")
+        return {"changed_keys": changed, "deleted_keys": deleted, "objects": current}
+
+
+    # Record the processed objects, so the next detect_changes only reports what changed since
+    def save_change_manifest(self, bucket_name, manifest_path, objects):
+        prefix, file_name = manifest_path.rsplit('/', 1)
+        return self.upload_to_s3(bucket_name, prefix, file_name, json.dumps(objects, indent=4), df=False)
 
 
 class ECS:
-    def __init__(self, aws_access_key_id, aws_secret_access_key):
-        aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key)
+    def __init__(self, aws_access_key_id, aws_secret_access_key, config=None):
+        aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key, config=config)
         self.ecs_client = aws_connection.get_client("ecs")
         self.ecr_client = aws_connection.get_client("ecr")
         self.region = aws_connection.region_name
@@ -261,8 +674,8 @@ class ECS:
 
 
 class StepFunction:
-    def __init__(self, aws_access_key_id, aws_secret_access_key):
-        aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key)
+    def __init__(self, aws_access_key_id, aws_secret_access_key, config=None):
+        aws_connection = AWSConnection(aws_access_key_id, aws_secret_access_key, config=config)
         self.sf_client = aws_connection.get_client("stepfunctions")
         self.region = aws_connection.region_name    
 
@@ -297,7 +710,7 @@ class StepFunction:
         try:
             response = self.sf_client.start_execution(
                 stateMachineArn=state_machine_arn,
-                input=str(input_data)  # Pass any input you want to provide to the state machine
+                input=json.dumps(input_data)  # Pass any input you want to provide to the state machine
             )
             print(f"Started Step Functions execution with ARN: {response['executionArn']}")
             return response['executionArn']
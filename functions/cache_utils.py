@@ -0,0 +1,97 @@
+import json
+import shutil
+import sqlite3
+from functions.utils import hash_text
+
+# Hash a model configuration, so any change in model or generation settings gives a new key
+def config_key(config):
+    return hash_text(json.dumps(config, sort_keys=True, default=str))
+
+# Key of the cached result of a text under a model configuration
+def result_key(cfg_key, text):
+    return f"{cfg_key}:{hash_text(text)}"
+
+# Key-value cache in a local SQLite file, used like a dict (key -> text) by coref_texts_cached
+# Lookups go to disk, so memory stays bounded however many entries the cache holds
+class SqliteCache:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)")
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+
+    def __getitem__(self, key):
+        row = self.conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def update(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?)", items)
+        self.conn.commit()
+
+    # Drop every entry whose key is not in keys
+    def prune(self, keys):
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep (key TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM keep")
+        self.conn.executemany("INSERT OR IGNORE INTO keep VALUES (?)", ((key,) for key in keys))
+        self.conn.execute("DELETE FROM cache WHERE key NOT IN (SELECT key FROM keep)")
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+
+    def close(self):
+        self.conn.close()
+
+# SqliteCache of extraction results (key -> result per text), stored as JSON
+# Only the results being looked up are held in memory, not the whole cache
+class ResultCache(SqliteCache):
+    def __getitem__(self, key):
+        return json.loads(super().__getitem__(key))
+
+    def update(self, items):
+        super().update((key, json.dumps(result)) for key, result in items)
+
+# Download a SQLite cache from S3 to local_path, streamed to disk, empty if there is none
+def load_sqlite_cache(s3, bucket_name, file_path, local_path, cache_class=SqliteCache):
+    response = s3.read_from_s3(bucket_name, file_path, df=False)
+    if response is not None:
+        with open(local_path, "wb") as cache_file:
+            shutil.copyfileobj(response, cache_file, 1024 * 1024)
+
+    cache = cache_class(local_path)
+    print(f"Loaded cache with {len(cache)} entries.")
+    return cache
+
+# Upload the SQLite cache file to S3, streamed from disk
+def save_sqlite_cache(s3, bucket_name, prefix, file_name, cache):
+    cache.conn.commit()
+    with open(cache.path, "rb") as cache_file:
+        return s3.upload_to_s3(bucket_name, prefix, file_name, cache_file, df=False)
+
+# Save the result cache, keeping only the results of keys (the texts of this run under its configuration)
+# Results of texts no longer in the corpus and of outdated configurations are dropped
+def save_result_cache(s3, bucket_name, prefix, file_name, cache, keys):
+    cache.prune(keys)
+    return save_sqlite_cache(s3, bucket_name, prefix, file_name, cache)
+
+# Get the result of every text, only running extract_docs_fn on texts missing from the cache
+# extract_docs_fn takes a list of texts and returns or yields one result per text
+# New results are written to the cache as they arrive, so memory only holds the results of the given texts
+def extract_docs_cached(texts, extract_docs_fn, cache, cfg_key):
+    keys = [result_key(cfg_key, text) for text in texts]
+
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in cache:
+            misses.setdefault(key, text)
+    print(f"Result cache: {len(keys) - len(misses)} hits, {len(misses)} misses.")
+
+    if misses:
+        cache.update(zip(misses.keys(), extract_docs_fn(list(misses.values()))))
+
+    return [cache[key] for key in keys]
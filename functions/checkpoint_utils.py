@@ -0,0 +1,84 @@
+import json
+import pandas as pd
+from functions.utils import hash_text, STAGE_SCHEMAS
+
+# Types of every column a raw frame can have, so shards read back the same whatever values they hold
+# e.g. a shard whose objects are all years still gives strings, not integers
+SHARD_SCHEMA = {**STAGE_SCHEMAS['entities'], **STAGE_SCHEMAS['relationships'], "label": "string"}
+SHARD_FORMAT = 'parquet'
+
+# (start, end) row ranges of shards of shard_size documents each
+# Windows of a text are adjacent rows with the same text_id, so a text never spans two shards
+def shard_bounds(meta, shard_size, id_col='text_id'):
+    if id_col in meta.columns:
+        doc_starts = (meta[id_col] != meta[id_col].shift()).to_numpy().nonzero()[0].tolist()
+    else:
+        doc_starts = list(range(len(meta)))
+
+    starts = doc_starts[::shard_size]
+    return list(zip(starts, starts[1:] + [len(meta)]))
+
+# Load the progress manifest of a previous run, None if there is none
+def load_manifest(s3, bucket_name, manifest_path):
+    response = s3.read_from_s3(bucket_name, manifest_path, df=False)
+    if response is None:
+        return None
+
+    return json.loads(response.read().decode('utf-8'))
+
+# Run extract_raw_fn over texts in shards of shard_size documents, uploading each shard's raw frames
+# and a progress manifest to prefix, so a restarted run skips shards that are already complete
+# Returns the raw frames of all shards merged together
+def extract_with_checkpoints(s3, bucket_name, prefix, texts, meta, extract_raw_fn, shard_size, run_key=''):
+    texts = list(texts)
+    if not texts:
+        return extract_raw_fn(texts, meta)
+
+    manifest_path = f"{prefix}/manifest.json"
+    bounds = shard_bounds(meta, shard_size)
+    n_shards = len(bounds)
+
+    # Shards can only be reused for the exact same input and shard size
+    input_hash = hash_text(run_key + json.dumps(texts) + meta.to_csv(index=False))
+
+    manifest = load_manifest(s3, bucket_name, manifest_path)
+    if (manifest is not None and manifest['input_hash'] == input_hash and manifest['shard_size'] == shard_size
+            and manifest.get('format') == SHARD_FORMAT and manifest.get('shard_unit') == 'text'):
+        print(f"Resuming from checkpoint, {len(manifest['completed'])}/{n_shards} shards already complete.")
+    else:
+        manifest = {"input_hash": input_hash,
+                    "shard_size": shard_size,
+                    "format": SHARD_FORMAT,
+                    "shard_unit": 'text',
+                    "n_shards": n_shards,
+                    "keys": [],
+                    "completed": []}
+
+    for shard in range(n_shards):
+        if shard in manifest['completed']:
+            continue
+
+        start, end = bounds[shard]
+        raw = extract_raw_fn(texts[start:end], meta.iloc[start:end])
+
+        for key, df in raw.items():
+            if not s3.upload_to_s3(bucket_name, prefix, f"{key}_{shard:05d}.{SHARD_FORMAT}", df, schema=SHARD_SCHEMA):
+                raise Exception(f"Failed to upload shard {shard}!")
+
+        manifest['keys'] = list(raw.keys())
+        manifest['completed'].append(shard)
+        s3.upload_to_s3(bucket_name, prefix, "manifest.json", json.dumps(manifest, indent=4), df=False)
+        print(f"Shard {shard + 1}/{n_shards} complete.")
+
+    # Merge all shards
+    raw = {}
+    for key in manifest['keys']:
+        shards = []
+        for shard in range(n_shards):
+            shard_df = s3.read_from_s3(bucket_name, f"{prefix}/{key}_{shard:05d}.{SHARD_FORMAT}")
+            if shard_df is None:
+                raise Exception(f"Failed to read shard {shard}!")
+            shards.append(shard_df)
+        raw[key] = pd.concat(shards, ignore_index=True)
+
+    return raw
@@ -0,0 +1,209 @@
+import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from io import BytesIO
+from botocore.exceptions import ClientError
+
+
+# Quoted md5 of a file's content, the ETag S3 gives to single-part uploads
+def file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(block)
+    return f'"{md5.hexdigest()}"'
+
+# Raise the same error boto3 raises, so callers handle local and S3 failures alike
+def client_error(code, message, operation_name):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation_name)
+
+
+# Local directory standing in for the subset of the boto3 S3 client used by the pipeline
+# Objects live at <root>/<bucket>/<key>, writes go to a temporary file first and are then
+# moved into place with os.replace, so readers never see a partially written object
+# LastModified is the file mtime and ETag is the quoted md5 of the content
+class LocalS3Client:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, ".tmp")
+        self.multipart_dir = os.path.join(self.root, ".multipart")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        os.makedirs(self.multipart_dir, exist_ok=True)
+
+        # md5 per (path, mtime, size), so unchanged objects are only hashed once
+        self._etags = {}
+
+    def _path(self, bucket, key, operation_name):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise client_error("InvalidKey", f"Invalid key '{key}'", operation_name)
+        return path
+
+    def _etag(self, path, stat):
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        if cache_key not in self._etags:
+            self._etags[cache_key] = file_md5(path)
+        return self._etags[cache_key]
+
+    def _metadata(self, path):
+        stat = os.stat(path)
+        return {
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc),
+            "ETag": self._etag(path, stat),
+        }
+
+    # Copy a file object to path through a temporary file and an atomic rename
+    def _write(self, path, fileobj):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False) as tmp_file:
+            shutil.copyfileobj(fileobj, tmp_file, 1024 * 1024)
+        os.replace(tmp_file.name, path)
+
+    def list_buckets(self):
+        return {"Buckets": [{"Name": name} for name in sorted(os.listdir(self.root))
+                            if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name))]}
+
+    def put_object(self, Bucket, Key, Body=b""):
+        path = self._path(Bucket, Key, "PutObject")
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        if isinstance(Body, bytes):
+            Body = BytesIO(Body)
+
+        self._write(path, Body)
+
+        return {"ETag": self._metadata(path)["ETag"]}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self._write(self._path(Bucket, Key, "PutObject"), Fileobj)
+
+    # Range takes the "bytes=start-end" form of S3, end inclusive
+    def get_object(self, Bucket, Key, Range=None):
+        path = self._path(Bucket, Key, "GetObject")
+        if not os.path.isfile(path):
+            raise client_error("NoSuchKey", "The specified key does not exist.", "GetObject")
+
+        response = self._metadata(path)
+        if Range is None:
+            response["Body"] = open(path, "rb")
+            return response
+
+        start, end = Range[len("bytes="):].split("-")
+        start, end = int(start), min(int(end), response["ContentLength"] - 1)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+
+        response["ContentRange"] = f"bytes {start}-{end}/{response['ContentLength']}"
+        response["ContentLength"] = len(data)
+        response["Body"] = BytesIO(data)
+        return response
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key, "HeadObject")
+        if not os.path.isfile(path):
+            raise client_error("404", "Not Found", "HeadObject")
+        return self._metadata(path)
+
+    # Keys are listed in lexicographic order like S3, up to MaxKeys per page
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, MaxKeys=1000, ContinuationToken=None, StartAfter=None):
+        bucket_root = os.path.join(self.root, Bucket)
+        if not os.path.isdir(bucket_root):
+            raise client_error("NoSuchBucket", "The specified bucket does not exist.", "ListObjectsV2")
+
+        keys = []
+        for dir_path, _, file_names in os.walk(bucket_root):
+            for file_name in file_names:
+                key = os.path.relpath(os.path.join(dir_path, file_name), bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+
+        start_after = ContinuationToken or StartAfter
+        if start_after:
+            keys = [key for key in keys if key > start_after]
+
+        contents, common_prefixes = [], []
+        last_key = None
+        for key in keys:
+            if len(contents) + len(common_prefixes) >= MaxKeys:
+                break
+
+            # Keys below the next delimiter are rolled up into a single common prefix
+            if Delimiter and Delimiter in key[len(Prefix):]:
+                common_prefix = key[:key.index(Delimiter, len(Prefix)) + len(Delimiter)]
+                if not common_prefixes or common_prefixes[-1]["Prefix"] != common_prefix:
+                    common_prefixes.append({"Prefix": common_prefix})
+                last_key = common_prefix + "\uffff"
+                continue
+
+            metadata = self._metadata(os.path.join(bucket_root, key))
+            contents.append({"Key": key,
+                             "Size": metadata["ContentLength"],
+                             "LastModified": metadata["LastModified"],
+                             "ETag": metadata["ETag"]})
+            last_key = key
+
+        remaining = [key for key in keys if last_key is None or key > last_key]
+        response = {"Contents": contents,
+                    "CommonPrefixes": common_prefixes,
+                    "KeyCount": len(contents) + len(common_prefixes),
+                    "IsTruncated": bool(remaining)}
+        if remaining:
+            response["NextContinuationToken"] = last_key
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(f"No local paginator for {operation_name}")
+        return LocalListObjectsPaginator(self)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self._path(Bucket, Key, "CreateMultipartUpload")
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.multipart_dir, upload_id))
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        part_path = os.path.join(self.multipart_dir, UploadId, f"{PartNumber:05d}")
+        with open(part_path, "wb") as part_file:
+            if isinstance(Body, bytes):
+                part_file.write(Body)
+            else:
+                shutil.copyfileobj(Body, part_file, 1024 * 1024)
+        return {"ETag": file_md5(part_path)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        path = self._path(Bucket, Key, "CompleteMultipartUpload")
+        upload_dir = os.path.join(self.multipart_dir, UploadId)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False) as tmp_file:
+            for part in sorted(MultipartUpload["Parts"], key=lambda part: part["PartNumber"]):
+                with open(os.path.join(upload_dir, f"{part['PartNumber']:05d}"), "rb") as part_file:
+                    shutil.copyfileobj(part_file, tmp_file, 1024 * 1024)
+        os.replace(tmp_file.name, path)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+        return {"Bucket": Bucket, "Key": Key, "ETag": self._metadata(path)["ETag"]}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(os.path.join(self.multipart_dir, UploadId), ignore_errors=True)
+        return {}
+
+
+class LocalListObjectsPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            yield response
+            if not response["IsTruncated"]:
+                break
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
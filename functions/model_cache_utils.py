@@ -0,0 +1,38 @@
+import os
+import tarfile
+import tempfile
+
+# Make the model weights of an artifact available in cache_dir, used as the Hugging Face cache (HF_HOME)
+# Weights already extracted to cache_dir (e.g. a mounted volume) are used as they are,
+# otherwise the artifact is downloaded from S3 and extracted
+def ensure_model_cache(s3, bucket_name, artifact_path, cache_dir):
+    marker = os.path.join(cache_dir, f".{os.path.basename(artifact_path)}.complete")
+    if os.path.exists(marker):
+        print(f"Using cached model weights in {cache_dir}.")
+        return True
+
+    response = s3.read_from_s3(bucket_name, artifact_path, df=False)
+    if response is None:
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with tarfile.open(fileobj=response, mode="r|gz") as tar:
+        tar.extractall(cache_dir)
+
+    # Only mark the cache complete once everything is extracted
+    open(marker, "w").close()
+    print(f"Model weights from {artifact_path} extracted to {cache_dir}.")
+    return True
+
+# Package the Hugging Face cache in cache_dir, and ONNX exports if any, and upload it to S3 as the model artifact
+def publish_model_cache(s3, bucket_name, artifact_path, cache_dir):
+    prefix, file_name = artifact_path.rsplit("/", 1)
+
+    with tempfile.TemporaryFile() as artifact:
+        with tarfile.open(fileobj=artifact, mode="w:gz") as tar:
+            tar.add(os.path.join(cache_dir, "hub"), arcname="hub")
+            if os.path.isdir(os.path.join(cache_dir, "onnx")):
+                tar.add(os.path.join(cache_dir, "onnx"), arcname="onnx")
+        artifact.seek(0)
+
+        return s3.upload_to_s3(bucket_name, prefix, file_name, artifact, df=False)
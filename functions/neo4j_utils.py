@@ -1,4 +1,16 @@
 from neo4j import GraphDatabase
+import re
+import time
+
+# Labels made only of letters, digits and underscores are used as they are, anything else is backtick-escaped
+LABEL_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Labels cannot be query parameters, so they are checked before being interpolated into Cypher
+def escape_label(label):
+    label = str(label)
+    if LABEL_PATTERN.match(label):
+        return label
+    return "`" + label.replace("`", "``") + "`"
 
 # Create a connection class
 class Neo4jConnection:
@@ -14,18 +26,27 @@ class Neo4jConnection:
         with self.driver.session() as session:
             return session.run(query, parameters)
 
-    def write_entities(self, entities_df):
+    # Entities are grouped by entity_type label and merged batch_size at a time, one transaction per batch
+    def write_entities(self, entities_df, batch_size=1000):
+        start_time = time.time()
+        entities_df = entities_df.fillna({"entity_type": "UNDEFINED"})
+
         with self.driver.session() as session:
             print("Writing entities to database...")
-            for _, row in entities_df.iterrows():
-                entity_label = row["entity_type"]  # Get entity type
+            for entity_label, group in entities_df.groupby("entity_type", sort=False):
                 query = f"""
-                MERGE (e:{entity_label} {{name: $name}})
+                UNWIND $rows AS row
+                MERGE (e:{escape_label(entity_label)} {{name: row.name}})
                 """
 
-                session.execute_write(lambda tx: tx.run(query, name=row["entity"], database_="neo4j"))
-        
-        print(f"Write completed! {len(entities_df)} entities added to database.")
+                names = group["entity"].dropna().tolist()
+                for start in range(0, len(names), batch_size):
+                    rows = [{"name": name} for name in names[start:start + batch_size]]
+                    session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+
+        elapsed = time.time() - start_time
+        print(f"Write completed! {len(entities_df)} entities added to database "
+              f"in {elapsed:.2f} s ({len(entities_df) / max(elapsed, 1e-9):.0f} rows/sec).")
 
     def write_relationships(self, relationships_df):
         print("Writing relationships to database...")
@@ -0,0 +1,34 @@
+import multiprocessing
+
+# Extraction function of the current worker process
+_WORKER = {}
+
+def _init_worker(load_extract_docs_fn, n_threads):
+    import torch
+    # Pin torch threads so workers do not compete for the same cores
+    # The loader gets n_threads too, for runtimes with their own thread pools such as ONNX Runtime
+    torch.set_num_threads(n_threads)
+    _WORKER['extract_docs_fn'] = load_extract_docs_fn(n_threads)
+
+def _run_worker(texts):
+    return list(_WORKER['extract_docs_fn'](texts))
+
+# Start a pool of workers that each load the model once through load_extract_docs_fn(n_threads)
+# Workers are forked so load_extract_docs_fn does not need to be picklable
+def start_worker_pool(load_extract_docs_fn, n_workers, n_threads=1):
+    print(f"Starting {n_workers} workers with {n_threads} threads each...")
+    return multiprocessing.get_context("fork").Pool(n_workers,
+                                                    initializer=_init_worker,
+                                                    initargs=(load_extract_docs_fn, n_threads))
+
+# Split texts into contiguous shards across the pool and return one result per text in order
+# Windows of a text are adjacent, so a text mostly stays within one shard
+def extract_docs_on_pool(pool, texts, n_workers, shards_per_worker=4):
+    texts = list(texts)
+    if not texts:
+        return []
+
+    shard_size = -(-len(texts) // (n_workers * shards_per_worker))
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+
+    return [result for shard in pool.map(_run_worker, shards, chunksize=1) for result in shard]
@@ -1,61 +1,178 @@
-import spacy
 import pandas as pd
-from functions.utils import clean_relationship_type
-from io import StringIO
+from functions.utils import clean_relationship_type_series
+from functions.window_utils import drop_window_duplicates
+import os
+import shutil
+import time
 
+# Named decoding profiles for mREBEL generation, from cheapest to most thorough
+DECODING_PROFILES = {
+    "fast": {
+        "max_length": 256,
+        "length_penalty": 0,
+        "num_beams": 1,
+        "num_return_sequences": 1,
+        "forced_bos_token_id": None,
+    },
+    "balanced": {
+        "max_length": 256,
+        "length_penalty": 0,
+        "num_beams": 3,
+        "num_return_sequences": 2,
+        "forced_bos_token_id": None,
+    },
+    "exhaustive": {
+        "max_length": 256,
+        "length_penalty": 0,
+        "num_beams": 5,
+        "num_return_sequences": 5,
+        "forced_bos_token_id": None,
+    },
+}
 
-def extract_triplets_typed(text):
+GEN_KWARGS = DECODING_PROFILES["exhaustive"]
+
+RAW_RELATIONSHIP_COLUMNS = ['subject', 'subject_entity_type', 'relationship', 'object', 'object_entity_type', 'confidence']
+
+
+# Ids of generated tokens that carry no span text (skip) and of triplet/type markers such as <triplet> or <per>
+def rebel_special_ids(tokenizer):
+    skip_tokens = ["<s>", "<pad>", "</s>", "tp_XX", "__en__"]
+    vocab = tokenizer.get_vocab()
+    skip_ids = {vocab[token] for token in skip_tokens if token in vocab}
+
+    marker_ids = {}
+    for token in list(tokenizer.get_added_vocab()) + tokenizer.all_special_tokens:
+        if token.startswith("<") and token.endswith(">") and token in vocab and vocab[token] not in skip_ids:
+            marker_ids[vocab[token]] = token
+
+    return skip_ids, marker_ids
+
+
+# Parse typed triplets from generated token ids, walking them against the special ids
+# and only decoding the span text between markers
+def extract_triplets_from_ids(token_ids, tokenizer, special_ids):
+    skip_ids, marker_ids = special_ids
     triplets = []
-    relation = ''
-    text = text.strip()
     current = 'x'
     subject, relation, object_, object_type, subject_type = '','','','',''
+    span = []
+
+    for token_id in list(token_ids) + [None]:
+        if token_id in skip_ids:
+            continue
+        if token_id is not None and token_id not in marker_ids:
+            span.append(token_id)
+            continue
+
+        # Marker or end of sequence, add the span text to the current field
+        if span:
+            span_text = ' ' + ' '.join(tokenizer.decode(span).split())
+            if current == 't':
+                subject += span_text
+            elif current == 's':
+                object_ += span_text
+            elif current == 'o':
+                relation += span_text
+            span = []
+
+        if token_id is None:
+            break
 
-    for token in text.replace("<s>", "").replace("<pad>", "").replace("</s>", "").replace("tp_XX", "").replace("__en__", "").split():
+        token = marker_ids[token_id]
         if token == "<triplet>" or token == "<relation>":
             current = 't'
             if relation != '':
                 triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
                 relation = ''
             subject = ''
-        elif token.startswith("<") and token.endswith(">"):
-            if current == 't' or current == 'o':
-                current = 's'
-                if relation != '':
-                    triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
-                object_ = ''
-                subject_type = token[1:-1]
-            else:
-                current = 'o'
-                object_type = token[1:-1]
-                relation = ''
+        elif current == 't' or current == 'o':
+            current = 's'
+            if relation != '':
+                triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
+            object_ = ''
+            subject_type = token[1:-1]
         else:
-            if current == 't':
-                subject += ' ' + token
-            elif current == 's':
-                object_ += ' ' + token
-            elif current == 'o':
-                relation += ' ' + token
+            current = 'o'
+            object_type = token[1:-1]
+            relation = ''
+
     if subject != '' and relation != '' and object_ != '' and object_type != '' and subject_type != '':
         triplets.append({'head': subject.strip(), 'head_type': subject_type, 'type': relation.strip(),'tail': object_.strip(), 'tail_type': object_type})
     return triplets
 
 
-def rebel_extract_entity_relationship(text_col, tokenizer, model):
+# Directory of the ONNX export of a model inside the model cache, packaged with the model artifact
+def onnx_export_dir(cache_dir, model_name):
+    return os.path.join(cache_dir, "onnx", model_name.replace("/", "--"))
 
-    all_triplets = []
+# Export the model to ONNX into onnx_dir unless an export is already there
+# Run once in the main process, so worker processes and later starts only load the export
+def export_rebel_onnx(model_name, onnx_dir):
+    if os.path.isdir(onnx_dir):
+        return onnx_dir
+
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    print(f"Exporting {model_name} to ONNX in {onnx_dir}...")
+
+    # Export next to the target and move it into place, so an interrupted export is never loaded
+    tmp_dir = f"{onnx_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(tmp_dir)
+    os.replace(tmp_dir, onnx_dir)
+    return onnx_dir
+
+# Load mREBEL for a CPU inference backend:
+# torch (full precision), torch-int8 (dynamically quantized linear layers) or onnx (ONNX Runtime export)
+# n_threads caps the intra-op threads of ONNX Runtime, torch threads are set with torch.set_num_threads
+def load_rebel_model(model_name, backend='torch', onnx_dir=None, n_threads=None):
+    if backend == 'torch':
+        from transformers import AutoModelForSeq2SeqLM
+        return AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+    elif backend == 'torch-int8':
+        import torch
+        from transformers import AutoModelForSeq2SeqLM
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
 
-    gen_kwargs = {
-    "max_length": 256,
-    "length_penalty": 0,
-    "num_beams": 5,
-    "num_return_sequences": 5,
-    "forced_bos_token_id": None,
-    }
+    elif backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        # Without a cap every session starts one thread per core, oversubscribing the CPU with several workers
+        session_options = None
+        if n_threads is not None:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = n_threads
+            session_options.inter_op_num_threads = 1
+
+        if onnx_dir is None:
+            return ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, session_options=session_options)
+        return ORTModelForSeq2SeqLM.from_pretrained(export_rebel_onnx(model_name, onnx_dir), session_options=session_options)
+
+    else:
+        raise Exception("No such backend!")
+
+
+# Extract the triplets of every text, returned as one list of triplets per text
+def rebel_extract_docs(text_col, tokenizer, model, batch_size=8, gen_kwargs=GEN_KWARGS):
+
+    text_col = list(text_col)
+
+    # Sort texts by token length so each batch holds similar lengths and needs little padding
+    lengths = [len(ids) for ids in tokenizer(text_col, max_length=256, truncation=True)["input_ids"]] if text_col else []
+    order = sorted(range(len(text_col)), key=lambda i: lengths[i])
+    triplets_per_text = [[] for _ in text_col]
+    seen_per_text = [set() for _ in text_col]
+    special_ids = rebel_special_ids(tokenizer)
+
+    start_time = time.time()
+    for batch_start in range(0, len(order), batch_size):
+        batch_idx = order[batch_start:batch_start + batch_size]
 
-    for text in text_col:
         #Tokenizer text
-        model_inputs = tokenizer(text, 
+        model_inputs = tokenizer([text_col[i] for i in batch_idx], 
                                  max_length=256, 
                                  padding=True, 
                                  truncation=True, 
@@ -69,15 +186,38 @@ def rebel_extract_entity_relationship(text_col, tokenizer, model):
             **gen_kwargs,
         )
 
-        # Extract text
-        decoded_preds = tokenizer.batch_decode(generated_tokens, skip_special_tokens=False)
+        # Every input returns num_return_sequences consecutive sequences
+        for idx, token_ids in enumerate(generated_tokens.tolist()):
+            text_idx = batch_idx[idx // gen_kwargs["num_return_sequences"]]
+
+            # Keep each triplet once per text, even if several beams return it
+            for triplet in extract_triplets_from_ids(token_ids, tokenizer, special_ids):
+                key = tuple(triplet.values())
+                if key not in seen_per_text[text_idx]:
+                    seen_per_text[text_idx].add(key)
+                    triplets_per_text[text_idx].append(triplet)
+
+        print(f"Extracting Entity-Relationship for {batch_start + len(batch_idx)}/{len(text_col)}...")
+
+    elapsed = time.time() - start_time
+    if text_col:
+        print(f"Processed {len(text_col)} texts at {len(text_col) / elapsed:.2f} docs/sec (batch size {batch_size}).")
+
+    return triplets_per_text
+
 
-        for idx, sentence in enumerate(decoded_preds):
-            triplets = extract_triplets_typed(sentence)
+# Turn triplets per text into the raw relationship frame
+def rebel_raw_from_docs(triplets_per_text, meta=None):
+
+    all_triplets = []
+    meta_records = None if meta is None else meta.to_dict('records')
+
+    # Carry over ids of the source text, e.g. text_id and window offsets
+    for text_idx, triplets in enumerate(triplets_per_text):
+        text_meta = {} if meta is None else meta_records[text_idx]
+        for triplet in triplets:
+            all_triplets.append((triplet, text_meta))
 
-            for triplet in triplets:
-                all_triplets.append(triplet)
-    
     # For aligning output with other models
     relationships_df = pd.DataFrame(
     [{
@@ -86,12 +226,27 @@ def rebel_extract_entity_relationship(text_col, tokenizer, model):
         'relationship': triplet['type'],
         'object': triplet['tail'],
         'object_entity_type': triplet['tail_type'].upper(),
-        'confidence': 'UNDEFINED'  # Adding a confidence column with default value
-    } for triplet in all_triplets]
+        'confidence': 'UNDEFINED',  # Adding a confidence column with default value
+        **text_meta
+    } for triplet, text_meta in all_triplets],
+    columns=RAW_RELATIONSHIP_COLUMNS + ([] if meta is None else list(meta.columns))
         )
-    
+
+    return {"relationships": relationships_df}
+
+
+def rebel_extract_raw(text_col, tokenizer, model, meta=None, batch_size=8, gen_kwargs=GEN_KWARGS):
+    return rebel_raw_from_docs(rebel_extract_docs(text_col, tokenizer, model, batch_size, gen_kwargs), meta)
+
+
+def rebel_build_frames(raw):
+    relationships_df = raw["relationships"]
+
+    # Triplets found again in an overlapping window of the same text
+    relationships_df = drop_window_duplicates(relationships_df, RAW_RELATIONSHIP_COLUMNS[:-1])
+
     relationships_df['confidence'] = 'UNDEFINED'
-    relationships_df['relationship'] = relationships_df['relationship'].apply(clean_relationship_type)
+    relationships_df['relationship'] = clean_relationship_type_series(relationships_df['relationship'])
 
     entities_df = pd.concat(
         [
@@ -102,4 +257,8 @@ def rebel_extract_entity_relationship(text_col, tokenizer, model):
         ]
     ).drop_duplicates(subset=['entity'])
 
-    return entities_df, relationships_df
\ No newline at end of file
+    return entities_df, relationships_df
+
+
+def rebel_extract_entity_relationship(text_col, tokenizer, model, meta=None, batch_size=8, gen_kwargs=GEN_KWARGS):
+    return rebel_build_frames(rebel_extract_raw(text_col, tokenizer, model, meta, batch_size, gen_kwargs))
\ No newline at end of file
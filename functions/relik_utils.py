@@ -1,66 +1,112 @@
 import pandas as pd
-import spacy
-from relik import Relik 
-from functions.utils import clean_relationship_type, add_entity_type
-
-def relik_extract_entity_relationship(text_list, relik):
-    entities = []
-    relationships = []
-
-    relik_out = relik(text_list, 
-                      top_k = 3)
-
-    index = 1
-    list_len = len(relik_out)
-
-    # Go through every sentence in one paragraph
-    for sentence in relik_out:
-        print(f"Extracting Entity-Relationship for {index}/{list_len}...")
-        spans = sentence.spans
-        ent_list = [(span.text, span.label) for span in spans]
-        entities.append(ent_list)
-        
-        triplets = sentence.triplets
-        if len(triplets) != 0:
-            rel_list = [(triplet.subject.text, triplet.label, triplet.object.text, triplet.confidence) for triplet in triplets]
-            relationships.append(rel_list)
-        
-        index += 1
-
-    # Flatten and remove duplicates using a set
-    entities_list = [(entity.lower(), label) for sublist in entities for entity, label in sublist]
-    relationships_list = [(subject.lower(), label.lower(), object.lower(), float(confidence))
-                                   for sublist in relationships for subject, label, object, confidence in sublist]
+import functools
+from functions.utils import clean_relationship_type_series, add_entity_type
+
+TOP_K = 3
+
+# Feed Relik fixed-size chunks of texts and yield (entity rows, relationship rows) for every text
+def relik_iter_docs(text_list, relik, chunk_size=32):
+    list_len = len(text_list)
+
+    for chunk_start in range(0, list_len, chunk_size):
+        relik_out = relik(text_list[chunk_start:chunk_start + chunk_size], 
+                          top_k = TOP_K)
+        if not isinstance(relik_out, list):
+            relik_out = [relik_out]
+
+        # Go through every sentence in one paragraph
+        docs = [([(span.text.lower(), span.label) for span in sentence.spans],
+                 [(triplet.subject.text.lower(), triplet.label.lower(), triplet.object.text.lower(), float(triplet.confidence))
+                  for triplet in sentence.triplets])
+                for sentence in relik_out]
+
+        # Release outputs of this chunk before moving on
+        del relik_out
+
+        print(f"Extracting Entity-Relationship for {min(chunk_start + chunk_size, list_len)}/{list_len}...")
+        yield from docs
+
+# Turn rows per text into the raw entity and relationship frames
+def relik_raw_from_docs(docs, meta=None):
+    meta_records = None if meta is None else meta.to_dict('records')
+
+    # Keep the first occurrence of every entity, and of every relationship per text, as texts come in
+    # A relationship found in several texts is kept once for each text, so every source gets credited
+    entities = {}
+    relationships = {}
+    text_id_idx = None if meta is None or 'text_id' not in meta.columns else list(meta.columns).index('text_id')
+
+    for doc_idx, (entity_rows, relationship_rows) in enumerate(docs):
+        for entity, label in entity_rows:
+            entities.setdefault(entity, (entity, label))
+
+        # Carry over ids of the source text, e.g. text_id and window offsets
+        text_meta = () if meta is None else tuple(meta_records[doc_idx].values())
+        text_key = () if text_id_idx is None else (text_meta[text_id_idx],)
+        for row in relationship_rows:
+            relationships.setdefault(tuple(row[:3]) + text_key, (*row, *text_meta))
 
     # Create DataFrame
-    entities_df = pd.DataFrame(entities_list, columns=['entity', 'label'])
-    relationships_df = pd.DataFrame(relationships_list, columns=['subject', 'relationship', 'object', 'confidence'])
+    entities_df = pd.DataFrame(list(entities.values()), columns=['entity', 'label'])
+    relationships_df = pd.DataFrame(list(relationships.values()),
+                                    columns=['subject', 'relationship', 'object', 'confidence'] + ([] if meta is None else list(meta.columns)))
+
+    return {"entities": entities_df, "relationships": relationships_df}
+
+def relik_extract_raw(text_list, relik, meta=None, chunk_size=32):
+    return relik_raw_from_docs(relik_iter_docs(list(text_list), relik, chunk_size), meta)
+
+def relik_build_frames(raw, entity_memo=None):
+    entities_df = raw["entities"]
+    relationships_df = raw["relationships"]
 
     # Keep unique entities and relationships
-    entities_df.drop('label', axis=1, inplace=True)
+    entities_df = entities_df.drop('label', axis=1)
     entities_df.drop_duplicates(subset=['entity'], inplace=True)
-    entities_df = extract_entity_type(entities_df)
+    entities_df = extract_entity_type(entities_df, entity_memo)
     entities_df.fillna('UNDEFINED', inplace=True)
 
-    relationships_df.drop_duplicates(subset=['subject', 'relationship', 'object'], inplace=True)
+    # Unique per text, e.g. across checkpoint shards, keeping the earliest window
+    key_cols = ['subject', 'relationship', 'object'] + (['text_id'] if 'text_id' in relationships_df.columns else [])
+    relationships_df = relationships_df.drop_duplicates(subset=key_cols).copy()
 
-    relationships_df['relationship'] = relationships_df['relationship'].apply(clean_relationship_type)
+    relationships_df['relationship'] = clean_relationship_type_series(relationships_df['relationship'])
     relationships_df =  add_entity_type(entities_df, relationships_df)
     
     return entities_df, relationships_df
 
-def extract_entity_type(entity_df):
+def relik_extract_entity_relationship(text_list, relik, meta=None, chunk_size=32, entity_memo=None):
+    return relik_build_frames(relik_extract_raw(text_list, relik, meta, chunk_size), entity_memo)
+
+# Load spaCy's English model once per process, keeping only the NER component
+@functools.lru_cache(maxsize=None)
+def load_ner_pipeline(model_name="en_core_web_sm"):
+    import spacy
+    nlp = spacy.load(model_name)
+    nlp.select_pipes(enable=["ner"])
+    return nlp
+
+def extract_entity_type(entity_df, entity_memo=None, batch_size=256):
     # List to store extracted entities
     entity_type = {"entity":[],
                   "entity_type": []}
-    
-    # Load spaCy's English model
-    nlp = spacy.load("en_core_web_sm")
+
+    # Memo of entity string -> [(entity text, entity type)] found by NER, updated in place
+    if entity_memo is None:
+        entity_memo = {}
+
+    # Only run NER on entities not seen before
+    misses = list(dict.fromkeys(entity for entity in entity_df['entity'] if entity not in entity_memo))
+    if misses:
+        nlp = load_ner_pipeline()
+        for entity, doc in zip(misses, nlp.pipe(misses, batch_size=batch_size)):
+            entity_memo[entity] = [(ent.text, ent.label_) for ent in doc.ents]
+    print(f"Entity type memo: {len(entity_df) - len(misses)} hits, {len(misses)} misses.")
+
     for entity in entity_df['entity']:
-        doc = nlp(entity)  # Process each word
-        for ent in doc.ents:
-            entity_type['entity'].append(ent.text)
-            entity_type['entity_type'].append(ent.label_)
+        for ent_text, ent_label in entity_memo[entity]:
+            entity_type['entity'].append(ent_text)
+            entity_type['entity_type'].append(ent_label)
 
     # Add entity type back to entity_df
     entity_df = entity_df.merge(
@@ -72,4 +118,25 @@ def extract_entity_type(entity_df):
             on='entity'
     )
 
-    return entity_df
\ No newline at end of file
+    return entity_df
+
+# Convert between the entity type memo and a DataFrame for storage
+# Entities without any NER match are kept with an empty entity text
+def entity_memo_from_df(memo_df):
+    entity_memo = {}
+    if memo_df is None:
+        return entity_memo
+
+    for entity, ent_text, ent_label in zip(memo_df['entity'], memo_df['ent_text'], memo_df['entity_type']):
+        ents = entity_memo.setdefault(entity, [])
+        if ent_text != '':
+            ents.append((ent_text, ent_label))
+
+    return entity_memo
+
+def entity_memo_to_df(entity_memo):
+    rows = []
+    for entity, ents in entity_memo.items():
+        rows.extend([(entity, ent_text, ent_label) for ent_text, ent_label in ents] or [(entity, '', '')])
+
+    return pd.DataFrame(rows, columns=['entity', 'ent_text', 'entity_type'])
@@ -1,43 +1,169 @@
-import spacy
+import numpy as np
 import pandas as pd
 import re
+import multiprocessing
+import hashlib
 
 def coref_text(coref_nlp, text):
     import coreferee
     coref_doc = coref_nlp(text)
-    resolved_text = ""
+
+    return resolve_coref_doc(coref_doc)
+
+# Resolve coreferences of a doc that has already gone through the coreferee pipeline
+def resolve_coref_doc(coref_doc):
+    # Map every token index inside a named entity to that entity's text once per doc
+    ent_lookup = {}
+    for e in coref_doc.ents:
+        for i in range(e.start, e.end):
+            ent_lookup.setdefault(i, e.text)
+
+    chains = coref_doc._.coref_chains
+    pieces = []
 
     for token in coref_doc:
-        repres = coref_doc._.coref_chains.resolve(token)
+        repres = chains.resolve(token)
         if repres:
-            resolved_text += " " + " and ".join(
+            pieces.append(" and ".join(
                 [
                     t.text
                     if t.ent_type_ == ""
-                    else [e.text for e in coref_doc.ents if t in e][0]
+                    else ent_lookup[t.i]
                     for t in repres
                 ]
-            )
+            ))
         else:
-            resolved_text += " " + token.text
+            pieces.append(token.text)
+
+    return "".join(" " + piece for piece in pieces)
+
+# Batched version of coref_text, parsing texts with nlp.pipe
+# Coreferee chains cannot be serialised back from spaCy's own worker processes,
+# so for n_process > 1 each forked worker runs nlp.pipe and resolution on its own batches
+def coref_texts(coref_nlp, texts, batch_size=64, n_process=1):
+    import coreferee
+    global _COREF_NLP
+
+    texts = list(texts)
+    if n_process <= 1 or len(texts) <= batch_size:
+        return [resolve_coref_doc(coref_doc)
+                for coref_doc in coref_nlp.pipe(texts, batch_size=batch_size)]
+
+    batches = [(texts[i:i + batch_size], batch_size) for i in range(0, len(texts), batch_size)]
+
+    # Workers inherit the loaded pipeline through fork instead of pickling it
+    _COREF_NLP = coref_nlp
+    with multiprocessing.get_context("fork").Pool(n_process) as pool:
+        resolved = pool.map(_coref_worker, batches, chunksize=1)
+
+    return [text for batch in resolved for text in batch]
+
+_COREF_NLP = None
+
+def _coref_worker(args):
+    texts, batch_size = args
+    return coref_texts(_COREF_NLP, texts, batch_size=batch_size)
 
-    return resolved_text
+# Explicit column types (arrow type names) of the DataFrames handed between pipeline stages
+STAGE_SCHEMAS = {
+    "merged": {
+        "index": "int64",
+        "source": "string",
+        "text": "string",
+        "source_id": "int64",
+        "text_id": "int64",
+        "coref_text": "string",
+    },
+    "entities": {
+        "entity": "string",
+        "entity_type": "string",
+    },
+    "relationships": {
+        "subject": "string",
+        "subject_entity_type": "string",
+        "relationship": "string",
+        "object": "string",
+        "object_entity_type": "string",
+        "confidence": "float64",
+        "text_id": "int64",
+        "window_id": "int64",
+        "char_start": "int64",
+        "char_end": "int64",
+        "source_id": "int64",
+    },
+}
+
+# Hash raw text to key cached results
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Coref texts, only resolving texts whose hash is not yet in the cache
+# The cache dict (text hash -> coref text) is updated in place
+def coref_texts_cached(coref_nlp, texts, cache, batch_size=64, n_process=1):
+    hashes = [hash_text(text) for text in texts]
+
+    # Resolve every unseen text once
+    misses = {}
+    for text_hash, text in zip(hashes, texts):
+        if text_hash not in cache:
+            misses.setdefault(text_hash, text)
+
+    resolved = coref_texts(coref_nlp, list(misses.values()), batch_size=batch_size, n_process=n_process)
+    cache.update(zip(misses.keys(), resolved))
+
+    print(f"Coref cache: {len(hashes) - len(misses)} hits, {len(misses)} misses.")
+    return [cache[text_hash] for text_hash in hashes]
+
+# Factorize values into integer codes that stay consistent across calls
+# The mapping dict (key -> code) is updated in place, null values get -1 like pd.factorize
+def factorize_stable(values, mapping, key=None):
+    codes = []
+    for value in values:
+        if pd.isna(value):
+            codes.append(-1)
+            continue
+        if key is not None:
+            value = key(value)
+        codes.append(mapping.setdefault(value, len(mapping)))
+
+    return codes
+
+# Precompiled patterns for text normalization
+UPPERCASE_WORD_PATTERN = re.compile(r'\b[A-Z]+\b')
+# Runs of two or more spaces, single spaces are left as they are instead of being replaced by themselves
+SPACES_PATTERN = re.compile("  +")
+RELATIONSHIP_INVALID_CHAR_PATTERN = re.compile(r"[^A-Z0-9_]")
 
 # Function to clean raw text
 def clean_text(text):
-    text = re.sub("\n", " ", text)
-    text = re.sub(r'\b[A-Z]+\b', '', text).strip()
-    text = re.sub(" +", " ", text)
+    text = text.replace("\n", " ")
+    text = UPPERCASE_WORD_PATTERN.sub('', text).strip()
+    text = SPACES_PATTERN.sub(" ", text)
 
     return text
 
+# Apply a string function once per distinct value of a Series, null values pass through as NaN
+# Runs the scalar function itself, so the output is identical to Series.apply on any string dtype
+def map_unique(values, fn):
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([fn(value) for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(mapped[codes], index=values.index, name=values.name)
+
+# clean_text over a Series of raw text, repeated texts are only cleaned once
+def clean_text_series(texts):
+    return map_unique(texts, clean_text)
+
 # Function to clean relationship type
 def clean_relationship_type(rel_type):
     rel_type = rel_type.upper()  # Convert to uppercase
     rel_type = rel_type.replace(" ", "_")  # Replace spaces with underscores
-    rel_type = re.sub(r"[^A-Z0-9_]", "", rel_type)  # Remove special characters (keep A-Z, 0-9, _)
+    rel_type = RELATIONSHIP_INVALID_CHAR_PATTERN.sub("", rel_type)  # Remove special characters (keep A-Z, 0-9, _)
     return rel_type
 
+# clean_relationship_type over a Series of relationship types, each distinct type is only cleaned once
+def clean_relationship_type_series(rel_types):
+    return map_unique(rel_types, clean_relationship_type)
+
 def add_entity_type(entities_df, relationships_df):
     relationships_df = pd.merge(
         relationships_df,
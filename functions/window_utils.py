@@ -0,0 +1,113 @@
+import re
+import pandas as pd
+
+# Lightweight rule-based sentence splitter, loaded once per process
+_SENTENCIZER = None
+
+def split_sentences(text):
+    global _SENTENCIZER
+    if _SENTENCIZER is None:
+        import spacy
+        _SENTENCIZER = spacy.blank("en")
+        _SENTENCIZER.add_pipe("sentencizer")
+
+    doc = _SENTENCIZER(text)
+    return [(sent.start_char, sent.end_char) for sent in doc.sents if sent.text.strip()]
+
+# Split the span text[start:end] at whitespace into (char_start, char_end, tokens) pieces of at most max_tokens tokens
+# A single word longer than max_tokens is cut between characters
+def split_span(text, start, end, count_tokens, max_tokens):
+    pieces = []
+    piece_start, piece_end, total = None, None, 0
+    for match in re.finditer(r"\S+", text[start:end]):
+        word_start, word_end = start + match.start(), start + match.end()
+        length = count_tokens(text[word_start:word_end])
+
+        if piece_start is not None and total + length > max_tokens:
+            pieces.append((piece_start, piece_end, total))
+            piece_start, total = None, 0
+
+        # Shrink an over-budget word from the end until the head fits, then continue with the rest
+        while length > max_tokens:
+            cut = word_end
+            while length > max_tokens and cut - word_start > 1:
+                cut = word_start + max(1, (cut - word_start) * max_tokens // length)
+                length = count_tokens(text[word_start:cut])
+            pieces.append((word_start, cut, length))
+            word_start = cut
+            length = count_tokens(text[word_start:word_end])
+        if word_start == word_end:
+            continue
+
+        if piece_start is None:
+            piece_start = word_start
+        piece_end = word_end
+        total += length
+
+    if piece_start is not None:
+        pieces.append((piece_start, piece_end, total))
+    return pieces
+
+# Split text into sentence-aligned (char_start, char_end) windows of at most max_tokens tokens
+# Consecutive windows share trailing sentences worth up to overlap tokens
+# A sentence longer than max_tokens is split at whitespace into pieces that fit
+def window_text(text, count_tokens, max_tokens, overlap=0):
+    sentences, lengths = [], []
+    for start, end in split_sentences(text):
+        length = count_tokens(text[start:end])
+        if length <= max_tokens:
+            sentences.append((start, end))
+            lengths.append(length)
+            continue
+        for piece_start, piece_end, piece_length in split_span(text, start, end, count_tokens, max_tokens):
+            sentences.append((piece_start, piece_end))
+            lengths.append(piece_length)
+
+    windows = []
+    i = 0
+    while i < len(sentences):
+        # Greedily add sentences until the token budget is reached
+        j, total = i, 0
+        while j < len(sentences) and (j == i or total + lengths[j] <= max_tokens):
+            total += lengths[j]
+            j += 1
+        windows.append((sentences[i][0], sentences[j - 1][1]))
+
+        if j == len(sentences):
+            break
+
+        # Step back over trailing sentences for the overlap, always moving forward
+        k, shared = j, 0
+        while k - 1 > i and shared + lengths[k - 1] <= overlap:
+            k -= 1
+            shared += lengths[k]
+
+        # Only overlap if the next sentence still fits, otherwise the window would only repeat old text
+        i = k if shared + lengths[j] <= max_tokens else j
+
+    return windows
+
+# Split every text of df into windows, keeping text_id and window offsets
+def window_texts(df, count_tokens, max_tokens, overlap=0, text_col='coref_text', id_col='text_id'):
+    windows = {id_col: [], "window_id": [], "char_start": [], "char_end": [], "window_text": []}
+
+    for text_id, text in zip(df[id_col], df[text_col]):
+        for window_id, (start, end) in enumerate(window_text(text, count_tokens, max_tokens, overlap)):
+            windows[id_col].append(text_id)
+            windows["window_id"].append(window_id)
+            windows["char_start"].append(start)
+            windows["char_end"].append(end)
+            windows["window_text"].append(text[start:end])
+
+    windows_df = pd.DataFrame(windows)
+    print(f"Split {len(df)} texts into {len(windows_df)} windows of at most {max_tokens} tokens.")
+    return windows_df
+
+# Drop triplets already extracted from an earlier overlapping window of the same text
+# Duplicates within a single window are kept as they are
+def drop_window_duplicates(df, cols, id_col='text_id'):
+    if df.empty or 'window_id' not in df.columns:
+        return df
+
+    first_window = df.groupby([id_col] + cols, sort=False, dropna=False)['window_id'].transform('min')
+    return df[df['window_id'] == first_window].copy()
@@ -1,12 +1,19 @@
+import time
+PROCESS_START = time.time()
+
 import pandas as pd
 import argparse
-from functions.relik_utils import *
-from functions.rebel_utils import *
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 from dotenv import load_dotenv
 from functions.aws_utils import S3
+from functions.utils import STAGE_SCHEMAS
+from functions.window_utils import window_texts
+from functions.checkpoint_utils import extract_with_checkpoints
+from functions.cache_utils import ResultCache, config_key, result_key, load_sqlite_cache, save_result_cache, extract_docs_cached
+from functions.parallel_utils import start_worker_pool, extract_docs_on_pool
+from functions.model_cache_utils import ensure_model_cache, publish_model_cache
 import os
-import time
+import json
+import tempfile
 
 # Create argument parser
 parser = argparse.ArgumentParser(description="Process some inputs.")
@@ -20,6 +27,92 @@ parser.add_argument(
     help="Currently Available Methods: relik, mrebel"
     )
 
+parser.add_argument(
+    "-w",
+    "--window-tokens",
+    type=int,
+    default=254,
+    help="Split texts into sentence-aligned windows of at most this many tokens, 0 to disable"
+    )
+
+parser.add_argument(
+    "--window-overlap",
+    type=int,
+    default=0,
+    help="Number of tokens shared between consecutive windows"
+    )
+
+parser.add_argument(
+    "-b",
+    "--batch-size",
+    type=int,
+    default=8,
+    help="Number of texts generated together by mREBEL"
+    )
+
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=32,
+    help="Number of texts passed to Relik at a time"
+    )
+
+parser.add_argument(
+    "--shard-size",
+    type=int,
+    default=256,
+    help="Checkpoint extraction output every N documents, keeping all windows of a text in one shard, 0 to disable"
+    )
+
+parser.add_argument(
+    "--no-result-cache",
+    action="store_true",
+    help="Extract every text instead of reusing results of previous runs"
+    )
+
+parser.add_argument(
+    "--backend",
+    type=str,
+    default='torch',
+    help="Inference backend for mrebel: torch, torch-int8, onnx"
+    )
+
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of worker processes running the model"
+    )
+
+parser.add_argument(
+    "--threads-per-worker",
+    type=int,
+    default=None,
+    help="Number of torch / ONNX Runtime threads per worker, defaults to CPU count divided by workers"
+    )
+
+parser.add_argument(
+    "-p",
+    "--profile",
+    type=str,
+    default='exhaustive',
+    help="Decoding profile for mrebel: fast, balanced, exhaustive"
+    )
+
+parser.add_argument(
+    "--model-cache-dir",
+    type=str,
+    default=None,
+    help="Local directory or mounted volume holding the model weights "
+         "(default: MODEL_CACHE_DIR, else .models under LOCAL_STORAGE_ROOT with local storage, else /models)"
+    )
+
+parser.add_argument(
+    "--publish-model-cache",
+    action="store_true",
+    help="Download the model weights from the model hub and upload them to S3 as the model artifact"
+    )
+
 # Parse arguments
 args = parser.parse_args()
 method = args.method
@@ -34,36 +127,208 @@ if __name__ == "__main__":
             aws_secret_access_key=AWS_SECRET_KEY)
 
     # Read data from S3
+    # Only the columns used here, the raw text in particular is never downloaded
     input_data = s3.read_from_s3('datathon2025',
-                              'data/preprocess/merged_df.csv')
-    text_col = input_data['coref_text'].tolist()
+                              'data/preprocess/merged_df.parquet',
+                              columns=['text_id', 'source_id', 'coref_text'])
+    input_data['coref_text'] = input_data['coref_text'].fillna('')
+
+    # With local storage, keep the weights next to the stored objects, where the user can write
+    local_storage = os.getenv("STORAGE_BACKEND") == "local"
+    if args.model_cache_dir is None:
+        default_cache_dir = os.path.join(os.getenv("LOCAL_STORAGE_ROOT", "storage"), ".models") if local_storage else "/models"
+        args.model_cache_dir = os.getenv("MODEL_CACHE_DIR", default_cache_dir)
+
+    # Load model weights from the local cache, falling back to the artifact on S3, never the model hub
+    model_artifact = f'models/{method}.tar.gz'
+    os.environ["HF_HOME"] = args.model_cache_dir
+    if not args.publish_model_cache:
+        if ensure_model_cache(s3, 'datathon2025', model_artifact, args.model_cache_dir):
+            os.environ["HF_HUB_OFFLINE"] = "1"
+        elif local_storage:
+            # First local run: fetch the weights once and store the artifact locally for later runs
+            print(f"Model weights not found in {args.model_cache_dir} or local storage, publishing them first.")
+            args.publish_model_cache = True
+        else:
+            raise Exception(f"Model weights not found in {args.model_cache_dir} or S3, run with --publish-model-cache first!")
 
     start_time = time.time()
-    # Choose model
+    # Choose model, only importing the stack of the selected method
     if method == 'relik':    
-        model = Relik.from_pretrained("relik-ie/relik-relation-extraction-large")
-        entities_df, relationships_df = relik_extract_entity_relationship(text_col, model)
+        from functions.relik_utils import TOP_K, relik_iter_docs, relik_raw_from_docs, relik_build_frames, entity_memo_from_df, entity_memo_to_df
+
+        model_name = "relik-ie/relik-relation-extraction-large"
+        count_tokens = lambda text: len(text.split())
+        # Entity types found in previous runs
+        entity_memo = entity_memo_from_df(s3.read_from_s3('datathon2025',
+                                                          'data/model-output/entity_type_cache.csv',
+                                                          dtype=str,
+                                                          keep_default_na=False))
+
+        def load_extract_docs_fn(n_threads=None):
+            from relik import Relik
+            model = Relik.from_pretrained(model_name)
+            return lambda texts: relik_iter_docs(texts, model, args.chunk_size)
+
+        raw_from_docs_fn = relik_raw_from_docs
+        build_fn = lambda raw: relik_build_frames(raw, entity_memo)
+        model_config = {"method": method, "model": model_name, "top_k": TOP_K}
 
     elif method == 'mrebel':
+        from transformers import AutoTokenizer
+        from functions.rebel_utils import DECODING_PROFILES, load_rebel_model, onnx_export_dir, export_rebel_onnx, rebel_extract_docs, rebel_raw_from_docs, rebel_build_frames
+
         # Load model and tokenizer
-        tokenizer = AutoTokenizer.from_pretrained("Babelscape/mrebel-large", src_lang="en_XX", tgt_lang="tp_XX") 
-        model = AutoModelForSeq2SeqLM.from_pretrained("Babelscape/mrebel-large")
+        model_name = "Babelscape/mrebel-large"
+        if args.profile not in DECODING_PROFILES:
+            raise Exception("No such decoding profile!")
+        gen_kwargs = DECODING_PROFILES[args.profile]
+        tokenizer = AutoTokenizer.from_pretrained(model_name, src_lang="en_XX", tgt_lang="tp_XX") 
+        count_tokens = lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+        # Export to ONNX once, before any worker starts, workers then only load the export
+        onnx_dir = onnx_export_dir(args.model_cache_dir, model_name)
+        if args.backend == 'onnx':
+            export_rebel_onnx(model_name, onnx_dir)
+
+        def load_extract_docs_fn(n_threads=None):
+            model = load_rebel_model(model_name, args.backend, onnx_dir, n_threads)
+            return lambda texts: rebel_extract_docs(texts, tokenizer, model, args.batch_size, gen_kwargs)
 
-        entities_df, relationships_df = rebel_extract_entity_relationship(text_col, tokenizer, model)
+        raw_from_docs_fn = rebel_raw_from_docs
+        build_fn = rebel_build_frames
+        model_config = {"method": method, "model": model_name, "profile": args.profile, "gen_kwargs": gen_kwargs, "backend": args.backend,
+                        "parser": "token-ids"}
     
     else:
         raise Exception("No such model!")
+
+    # Populate the cache from the model hub and upload it as the artifact for later runs
+    if args.publish_model_cache:
+        model_extract_docs_fn = load_extract_docs_fn()
+        publish_model_cache(s3, 'datathon2025', model_artifact, args.model_cache_dir)
+
+    # Shard inference across worker processes, each loading the model once
+    if args.workers > 1:
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        n_threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+        pool = start_worker_pool(load_extract_docs_fn, args.workers, n_threads)
+        model_extract_docs_fn = lambda texts: extract_docs_on_pool(pool, texts, args.workers)
+    elif not args.publish_model_cache:
+        model_extract_docs_fn = load_extract_docs_fn()
+    print(f"Model ready {time.time() - PROCESS_START:.2f} seconds after start.")
+
+    # Report the time from process start until the first extraction result
+    timings = {}
+    def extract_docs_fn(texts):
+        for result in model_extract_docs_fn(texts):
+            if 'time_to_first_inference' not in timings:
+                timings['time_to_first_inference'] = round(time.time() - PROCESS_START, 4)
+                print(f"Time to first inference: {timings['time_to_first_inference']:.2f} seconds.")
+            yield result
+
+    # Reuse results of previous runs with the same model configuration
+    cfg_key = config_key(model_config)
+    if args.no_result_cache:
+        extract_raw_fn = lambda texts, meta: raw_from_docs_fn(extract_docs_fn(texts), meta)
+    else:
+        # Results live in a local SQLite file, so the cache does not grow memory with the corpus
+        result_cache_dir = tempfile.TemporaryDirectory()
+        result_cache = load_sqlite_cache(s3,
+                                         'datathon2025',
+                                         f'data/model-output/cache/results_{method}.sqlite',
+                                         os.path.join(result_cache_dir.name, f'results_{method}.sqlite'),
+                                         cache_class=ResultCache)
+        extract_raw_fn = lambda texts, meta: raw_from_docs_fn(
+            extract_docs_cached(texts, extract_docs_fn, result_cache, cfg_key), meta)
+
+    # Only extract from each unique text once
+    unique_data = input_data.drop_duplicates(subset=['text_id'])
+
+    # Split long texts into windows that fit the model's token budget
+    if args.window_tokens > 0:
+        windows_df = window_texts(unique_data, count_tokens, args.window_tokens, args.window_overlap)
+        windows_per_text = windows_df.groupby('text_id').size()
+        saved = int(input_data['text_id'].map(windows_per_text).fillna(0).sum()) - len(windows_df)
+
+        texts = windows_df['window_text'].tolist()
+        meta = windows_df[['text_id', 'window_id', 'char_start', 'char_end']]
+    else:
+        saved = len(input_data) - len(unique_data)
+        texts = unique_data['coref_text'].tolist()
+        meta = unique_data[['text_id']]
+
+    # Extract in checkpointed shards so an interrupted run can resume
+    if args.shard_size > 0:
+        raw = extract_with_checkpoints(s3,
+                                       'datathon2025',
+                                       f'data/model-output/shards/{method}',
+                                       texts,
+                                       meta,
+                                       extract_raw_fn,
+                                       args.shard_size,
+                                       run_key=cfg_key)
+    else:
+        raw = extract_raw_fn(texts, meta)
+
+    if args.workers > 1:
+        pool.close()
+        pool.join()
+
+    entities_df, relationships_df = build_fn(raw)
+
+    print(f"Extracted from {len(unique_data)} unique texts out of {len(input_data)} rows, {saved} model invocations saved.")
+
+    # Join results back to every source the text came from
+    relationships_df = relationships_df.merge(
+        input_data[['text_id', 'source_id']].drop_duplicates(),
+        how='left',
+        on='text_id'
+    )
     
     end_time = time.time()
     print(f"Execution time: {end_time - start_time:.4f} seconds")
 
+    # Record the configuration this output was produced with
+    run_info = {**model_config,
+                **timings,
+                "execution_time": round(end_time - start_time, 4),
+                "n_texts": len(unique_data),
+                "n_entities": len(entities_df),
+                "n_relationships": len(relationships_df)}
+    s3.upload_to_s3('datathon2025',
+            'data/model-output',
+            f'run_info_{method}.json',
+            json.dumps(run_info, indent=4),
+            df=False)
+
+    # Save extraction results of the texts of this run for the next run
+    if not args.no_result_cache:
+        save_result_cache(s3,
+                          'datathon2025',
+                          'data/model-output/cache',
+                          f'results_{method}.sqlite',
+                          result_cache,
+                          (result_key(cfg_key, text) for text in texts))
+        result_cache.close()
+        result_cache_dir.cleanup()
+
+    # Save entity types for the next run
+    if method == 'relik':
+        s3.upload_to_s3('datathon2025',
+                'data/model-output',
+                'entity_type_cache.csv',
+                entity_memo_to_df(entity_memo))
+
     # Upload output back to S3
     s3.upload_to_s3('datathon2025',
             'data/model-output',
-            f'entities_df_{method}.csv',
-            entities_df)
+            f'entities_df_{method}.parquet',
+            entities_df,
+            schema=STAGE_SCHEMAS['entities'])
 
     s3.upload_to_s3('datathon2025',
             'data/model-output',
-            f'relationships_df_{method}.csv',
-            relationships_df)
\ No newline at end of file
+            f'relationships_df_{method}.parquet',
+            relationships_df,
+            schema=STAGE_SCHEMAS['relationships'])
\ No newline at end of file
@@ -3,6 +3,19 @@ from functions.aws_utils import *
 from dotenv import load_dotenv
 import os       
 import json
+import subprocess
+import sys
+
+# Pipeline stages in Step Functions order, as launched by their Dockerfiles
+LOCAL_STAGES = [
+    ["data_preprocessing.py"],
+    ["model.py", "-m", "relik"],
+    ["data_quality_check.py"],
+    ["upload_to_neo4j.py"],
+]
+
+# ETag and size of every watched object as of the last started run
+CHANGE_MANIFEST = "configs/change_manifest.json"
 
     
 if __name__ == "__main__":
@@ -13,14 +26,27 @@ if __name__ == "__main__":
 
     s3 = S3(aws_access_key_id=AWS_ACCESS_KEY_ID, 
             aws_secret_access_key=AWS_SECRET_KEY)
+
+    # Prefixes whose changes trigger the pipeline, comma separated
+    WATCHED_PREFIXES = os.getenv("WATCHED_PREFIXES", "data/raw-data/").split(",")
     
-    sf = StepFunction(aws_access_key_id=AWS_ACCESS_KEY_ID, 
-                      aws_secret_access_key=AWS_SECRET_KEY)
-    
-    flag = s3.check_file_update("datathon2025", "data/validation/clean_entities_df.csv")
-    flag2 = s3.check_file_update("datathon2025", "data/validation/clean_relationships_df.csv")
+    # Trigger only if objects under the watched prefixes changed since the last processed run
+    changes = s3.detect_changes("datathon2025", WATCHED_PREFIXES, CHANGE_MANIFEST)
+    flag = bool(changes["changed_keys"] or changes["deleted_keys"])
+    started = False
+
+    if flag and os.getenv("STORAGE_BACKEND") == "local":
+        # Co-located run: every stage on this host against local storage, no Step Functions
+        print("Executing pipeline stages locally...")
+        for stage in LOCAL_STAGES:
+            print(f"Running {' '.join(stage)}")
+            subprocess.check_call([sys.executable] + stage)
+        started = True
+
+    elif flag:
+        sf = StepFunction(aws_access_key_id=AWS_ACCESS_KEY_ID, 
+                          aws_secret_access_key=AWS_SECRET_KEY)
 
-    if flag or flag2:
         print("Executing step function workflow...")
         response = s3.read_from_s3("datathon2025",
                         "configs/sf_vars.json",
@@ -28,4 +54,15 @@ if __name__ == "__main__":
         
         sf_vars = json.loads(response.read().decode('utf-8'))
 
-        sf.start_step_function_execution(sf_vars['state_machine_arn'])
+        # Downstream stages can restrict themselves to the changed keys
+        execution_arn = sf.start_step_function_execution(sf_vars['state_machine_arn'],
+                                                         {"changed_keys": changes["changed_keys"],
+                                                          "deleted_keys": changes["deleted_keys"]})
+        started = execution_arn is not None
+
+    else:
+        print("No changes in watched objects, pipeline not started.")
+
+    # Only record the new state once the run is under way, so a failed start is retried next time
+    if started:
+        s3.save_change_manifest("datathon2025", CHANGE_MANIFEST, changes["objects"])
@@ -17,6 +17,14 @@ parser.add_argument(
     help="Currently Available Methods: relik, mrebel"
     )
 
+parser.add_argument(
+    "-b",
+    "--batch-size",
+    type=int,
+    default=1000,
+    help="Number of entities written per transaction"
+    )
+
 # Parse arguments
 args = parser.parse_args()
 method = args.method
@@ -39,16 +47,21 @@ if __name__ == "__main__":
             aws_secret_access_key=AWS_SECRET_KEY)
     
     # Retrieve dfs
-    entities_df = s3.read_from_s3('datathon2025',
-                              f'data/validation/entities_df_{method}.csv')
-
-    relationships_df = s3.read_from_s3('datathon2025',
-                              f'data/validation/relationships_df_{method}.csv')
+    # Outputs of data_quality_check.py
+    entities_path = 'data/validation/clean_entities_df.parquet'
+    relationships_path = 'data/validation/clean_relationships_df.parquet'
+    # Only the columns written to the graph, ids and window offsets are not downloaded
+    dfs = s3.read_many('datathon2025', {
+        entities_path: {"columns": ['entity', 'entity_type']},
+        relationships_path: {"columns": ['subject', 'relationship', 'object', 'confidence',
+                                         'subject_entity_type', 'object_entity_type']},
+    })
+    entities_df, relationships_df = dfs[entities_path], dfs[relationships_path]
     
     # Initialize connection to Neo4j
     dbconn = Neo4jConnection(URI, AUTH[0], AUTH[1])
 
-    dbconn.write_entities(entities_df)
+    dbconn.write_entities(entities_df, batch_size=args.batch_size)
     dbconn.write_relationships(relationships_df)
 
     dbconn.close()